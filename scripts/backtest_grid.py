@@ -0,0 +1,33 @@
+import yaml
+from pathlib import Path
+from src.backtest import grid_backtest, GRID_KEYS
+from src.train import load_proba_store, OUT_PROBA
+
+def main():
+    """
+    backtest ทุกชุดพารามิเตอร์ใน trade_grid (config) บน proba ที่เก็บไว้ใน outputs/proba (ไม่เทรนใหม่)
+    - outputs/metrics/trade_grid.csv  หนึ่งแถวต่อ (window, ชุดพารามิเตอร์)
+    แล้วพิมพ์ชุดที่ median total_return_equity ข้าม window สูงสุด
+    """
+    cfg = yaml.safe_load(open("configs/config.yaml", encoding="utf-8"))
+    g = cfg["trade_grid"]
+    store = load_proba_store()
+    if not store:
+        print(f"No stored probabilities in {OUT_PROBA} -> run training first")
+        return
+
+    table = grid_backtest(store, g, base=cfg["trade"], workers=g.get("workers", 0))
+    Path("outputs/metrics").mkdir(parents=True, exist_ok=True)
+    table.to_csv("outputs/metrics/trade_grid.csv", index=False)
+
+    agg = (table.groupby(GRID_KEYS)
+           .agg(windows=("window", "nunique"), sum_trades=("trades", "sum"),
+                median_win_rate=("win_rate", "median"), median_profit_factor=("profit_factor", "median"),
+                median_total_return_equity=("total_return_equity", "median"),
+                median_max_drawdown=("max_drawdown", "median"))
+           .reset_index().sort_values("median_total_return_equity", ascending=False))
+    print(agg.head(20).to_string(index=False))
+    print(f"{len(agg)} combos x {len(store)} windows -> outputs/metrics/trade_grid.csv")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+from src.train import backtest_only
+
+if __name__ == "__main__":
+    backtest_only("configs/config.yaml")
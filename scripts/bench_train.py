@@ -0,0 +1,58 @@
+import copy
+import yaml
+from pathlib import Path
+import pandas as pd
+import torch
+from src.train import iter_windows, train_one_window
+from src.utils.accel import apply_threads
+
+MODES = {
+    "eager+fp32": {"compile": False, "precision": "fp32"},
+    "eager+bf16": {"compile": False, "precision": "bf16"},
+    "compile+fp32": {"compile": True, "precision": "fp32"},
+    "compile+bf16": {"compile": True, "precision": "bf16"},
+    "tbptt+fp32": {"mode": "tbptt", "compile": False, "precision": "fp32"},
+    "tbptt+bf16": {"mode": "tbptt", "compile": False, "precision": "bf16"},
+}
+
+def main(cfg_path="configs/config.yaml", max_train=20000, epochs=3, tbptt_epochs=40, seed=0):
+    """
+    micro-benchmark โหมดเทรนบน window แรก (ตัด train เหลือ max_train แถวท้าย, valid/test ไม่เกิน 1/4 ของนั้น)
+    รายงาน samples/s ของ train step (tbptt = timestep ที่คิด loss/s), เวลาทั้งหมด และ valid accuracy ต่อโหมด
+    tbptt หนึ่ง epoch มีไม่กี่ optimizer step จึงใช้งบ tbptt_epochs แยก (เทียบกันที่ accuracy และเวลาทั้งหมด)
+    -> outputs/metrics/bench_train.csv
+    โหมดที่เครื่องไม่รองรับจะถอยเป็น eager (คอลัมน์ mode บอกโหมดที่ใช้จริง)
+    """
+    cfg = yaml.safe_load(open(cfg_path, encoding="utf-8"))
+    cfg["train"].update(max_epochs=epochs, early_stop_patience=epochs)
+    apply_threads(cfg["train"])
+    df, tr, va, te = next(iter_windows(cfg))
+    tr, va, te = tr[-max_train:], va[:max_train // 4], te[:max_train // 4]
+    feat_cols = [c for c in df.columns if c not in {"timestamp","open","high","low","close","volume","target"}]
+    print(f"threads={torch.get_num_threads()} train={len(tr)} valid={len(va)} seq_len={cfg['train']['seq_len']}")
+
+    rows = []
+    for name, m in MODES.items():
+        c = copy.deepcopy(cfg)
+        c["train"].update(m)
+        if m.get("mode") == "tbptt":
+            c["train"].update(max_epochs=tbptt_epochs, early_stop_patience=tbptt_epochs)
+        torch.manual_seed(seed)
+        try:
+            _, _, _, info = train_one_window(c, df, feat_cols, tr, va, te)
+        except ValueError as e:
+            # เช่น tbptt ที่ max_train สั้นเกิน streams * (burn_in + 1): ข้ามโหมดนั้นแทนการรายงาน 0 samples/s
+            print(f"skip {name}: {e}")
+            continue
+        rows.append({"requested": name, "mode": info["mode"],
+                     "samples_per_s": info["samples_per_s"], "train_seconds": info["train_seconds"],
+                     "best_val_acc": info["best_val_acc"]})
+        print(rows[-1])
+    out = Path("outputs/metrics"); out.mkdir(parents=True, exist_ok=True)
+    res = pd.DataFrame(rows)
+    res.to_csv(out / "bench_train.csv", index=False)
+    print(res.to_string(index=False))
+    print("Saved:", out / "bench_train.csv")
+
+if __name__ == "__main__":
+    main()
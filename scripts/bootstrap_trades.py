@@ -0,0 +1,36 @@
+import time
+import yaml
+from pathlib import Path
+import pandas as pd
+from src.bootstrap import bootstrap_windows
+
+def main():
+    """
+    ช่วงความเชื่อมั่นของ profit_factor / total_return_equity / max_drawdown / win_rate ต่อ window
+    และของประวัติเทรดทั้งหมด จาก outputs/trades/trades_w*.parquet (ตั้งค่าใน bootstrap: ของ config)
+    - outputs/metrics/bootstrap_ci.csv  หนึ่งแถวต่อ (window, metric)
+    """
+    cfg = yaml.safe_load(open("configs/config.yaml", encoding="utf-8"))
+    b = cfg.get("bootstrap", {})
+    files = {int(p.stem.removeprefix("trades_w")): p for p in Path("outputs/trades").glob("trades_w*.parquet")}
+    rets = {}
+    for k in sorted(files):
+        t = pd.read_parquet(files[k])
+        rets[k] = t["ret"].to_numpy() if len(t) else []
+    if not rets:
+        print("No trade files in outputs/trades -> run training or backtest_only first")
+        return
+
+    n_resamples = int(b.get("n_resamples", 2000))
+    t0 = time.perf_counter()
+    table = bootstrap_windows(rets, n_resamples=n_resamples, method=b.get("method", "block"),
+                              block_len=int(b.get("block_len", 0)), ci=float(b.get("ci", 0.95)), seed=b.get("seed", 0))
+    elapsed = time.perf_counter() - t0
+    Path("outputs/metrics").mkdir(parents=True, exist_ok=True)
+    table.to_csv("outputs/metrics/bootstrap_ci.csv", index=False)
+    print(table[table["window"] == "all"].to_string(index=False))
+    print(f"{len(rets)} windows, {int(sum(len(r) for r in rets.values()))} trades, "
+          f"{n_resamples} {b.get('method', 'block')} resamples in {elapsed:.2f}s -> outputs/metrics/bootstrap_ci.csv")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import yaml
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from src.data.schema import from_prepared
+from src.features.indicators import add_features
+from src.labeling.triple_barrier import label_grid
+
+def main():
+    """
+    สร้างป้ายของทุกชุด barrier ใน label_grid (config) ในรอบเดียว แล้วบันทึก
+    - outputs/labels/label_grid.npy   เมทริกซ์ int8 [แท่ง, ชุดพารามิเตอร์] (คอลัมน์ตามลำดับแถวใน csv)
+    - outputs/metrics/label_grid_stats.csv  สัดส่วนคลาสต่อชุด + flag rejected (คลาสน้อยเกิน min_class_frac)
+    """
+    cfg = yaml.safe_load(open("configs/config.yaml", encoding="utf-8"))
+    g = cfg["label_grid"]
+    df = from_prepared(pd.read_parquet("data/prepared/btc_5m_clean.parquet"), cfg["data"])
+    df = add_features(df.sort_values("timestamp").reset_index(drop=True), cfg).reset_index(drop=True)
+
+    # grid ใช้ method ของตัวเอง (ไม่ตาม label.method): proxy ไม่ขึ้นกับ tp/sl จึงเทียบ barrier ไม่ได้
+    method = g.get("method", "first_touch")
+    if method == "proxy" and len(g.get("atr_mult_tp", [])) * len(g.get("atr_mult_sl", [])) > 1:
+        print("Note: label_grid.method=proxy ignores atr_mult_tp/atr_mult_sl (barrier combos collapse)")
+    labels, stats = label_grid(df, g, method=method)
+    stats["rejected"] = stats["min_class_frac"] < g.get("min_class_frac", 0.0)
+
+    Path("outputs/labels").mkdir(parents=True, exist_ok=True)
+    Path("outputs/metrics").mkdir(parents=True, exist_ok=True)
+    np.save("outputs/labels/label_grid.npy", labels)
+    stats.to_csv("outputs/metrics/label_grid_stats.csv", index=False)
+    print(stats.to_string(index=False))
+    print(f"{len(stats)} combos, {int(stats['rejected'].sum())} rejected; labels {labels.shape} int8")
+    print("Saved: outputs/labels/label_grid.npy, outputs/metrics/label_grid_stats.csv")
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,55 @@
 import yaml
+import pandas as pd
 from pathlib import Path
 from src.data.load import load_all
+from src.data.incremental import incremental_update
+from src.data.store import write_partitioned, PARTS_DIR
+from src.data.schema import to_prepared, from_prepared
 
 def main():
     cfg = yaml.safe_load(open("configs/config.yaml", encoding="utf-8"))
-    df = load_all(
-        cfg["data"]["raw_glob"],
-        cfg["data"]["tz_source"],
-        cfg["data"]["tz_target"],
-        ensure_regular=cfg["data"]["ensure_regular_5m"]
+    load_kw = dict(
+        workers=cfg["data"].get("load_workers", 1),
+        executor=cfg["data"].get("load_executor", "process"),
+        arrow_parquet=cfg["data"].get("arrow_parquet", False),
+        engine=cfg["data"].get("regular_engine", "join"),
     )
     Path("data/prepared").mkdir(parents=True, exist_ok=True)
     out = "data/prepared/btc_5m_clean.parquet"
-    df.to_parquet(out)
-    print("Saved:", out, "| shape:", df.shape, "| range:", df["timestamp"].min(), "→", df["timestamp"].max())
+
+    incremental = cfg["data"].get("incremental", False)
+    if incremental:
+        df, info = incremental_update(cfg["data"], out, "data/prepared/manifest.json", **load_kw)
+        print("Incremental:", info)
+        if df is None:
+            print("Up to date:", out)
+            return
+    else:
+        df = load_all(
+            cfg["data"]["raw_glob"],
+            cfg["data"]["tz_source"],
+            cfg["data"]["tz_target"],
+            ensure_regular=cfg["data"]["ensure_regular_5m"],
+            fill_seams=cfg["data"].get("fill_seams", False),
+            **load_kw,
+        )
+        to_prepared(df, cfg["data"]).to_parquet(out)
+    if "filled_bars" in df.attrs:
+        print("Filled bars:", df.attrs["filled_bars"])
+    tail = incremental and info["mode"] == "incremental"
+    if cfg["data"].get("partitioned", False):
+        touched = info["touched"] if tail and Path(PARTS_DIR).exists() else None
+        if tail and touched is None:
+            # ยังไม่มี partitioned store: ต้องเขียนทั้งหมดจาก store ที่เพิ่งอัปเดต (df เป็นแค่ส่วนท้าย)
+            df = from_prepared(pd.read_parquet(out), cfg["data"])
+            tail = False
+        write_partitioned(to_prepared(df, cfg["data"]), PARTS_DIR, touched=touched)
+        print("Partitioned store:", PARTS_DIR)
+    if tail:
+        print("Saved:", out, "| rows:", info["rows"], "| rebuilt tail:", df.shape,
+              "| range:", df["timestamp"].min(), "→", df["timestamp"].max())
+    else:
+        print("Saved:", out, "| shape:", df.shape, "| range:", df["timestamp"].min(), "→", df["timestamp"].max())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,42 @@
+import copy, tempfile
+import yaml
+from pathlib import Path
+import pandas as pd
+from src.data.schema import compact_bars, expand_bars, drift_report, frame_nbytes
+from src.train import prepare_frame
+
+def main():
+    """
+    วัดผลของ compact schema เทียบเส้นทาง float64 บน prepared data ปัจจุบัน:
+    หน่วยความจำ/ขนาด parquet ของ bars, หน่วยความจำของ feature matrix และ drift ต่อคอลัมน์
+    """
+    cfg = yaml.safe_load(open("configs/config.yaml", encoding="utf-8"))
+    bars = expand_bars(pd.read_parquet("data/prepared/btc_5m_clean.parquet"), cfg["data"].get("price_scale", 100), "float64")
+    bars = bars.sort_values("timestamp").reset_index(drop=True)
+    price_dtype = cfg["data"].get("price_dtype", "float32")
+    small = compact_bars(bars, price_dtype, cfg["data"].get("price_scale", 100))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bars.to_parquet(Path(tmp) / "f64.parquet", index=False)
+        small.to_parquet(Path(tmp) / "compact.parquet", index=False)
+        size64 = (Path(tmp) / "f64.parquet").stat().st_size
+        size32 = (Path(tmp) / "compact.parquet").stat().st_size
+
+    cfg64 = copy.deepcopy(cfg); cfg64["feature"]["dtype"] = "float64"
+    cfg32 = copy.deepcopy(cfg); cfg32["feature"]["dtype"] = "float32"
+    ref = prepare_frame(bars, cfg64)
+    cmp = prepare_frame(expand_bars(small, cfg["data"].get("price_scale", 100)), cfg32)
+    drop_cols = {"timestamp","open","high","low","close","volume","target"}
+    feat_cols = [c for c in ref.columns if c not in drop_cols]
+
+    print(f"bars memory  : {frame_nbytes(bars)/2**20:.1f} MB -> {frame_nbytes(small)/2**20:.1f} MB")
+    print(f"bars parquet : {size64/2**20:.1f} MB -> {size32/2**20:.1f} MB")
+    print(f"feature X    : {ref[feat_cols].to_numpy().nbytes/2**20:.1f} MB -> {cmp[feat_cols].to_numpy().nbytes/2**20:.1f} MB")
+    rep = drift_report(ref, cmp, feat_cols + ["target"])
+    out = Path("outputs/metrics"); out.mkdir(parents=True, exist_ok=True)
+    rep.to_csv(out / "schema_drift.csv", index=False)
+    print(rep.to_string(index=False))
+    print("Saved:", out / "schema_drift.csv")
+
+if __name__ == "__main__":
+    main()
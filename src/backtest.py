@@ -1,61 +1,325 @@
+import itertools
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 
-def run_backtest(prices: pd.DataFrame, proba: np.ndarray, thr: float, fee_bps: float, slippage_bps: float, atr_tp: float, atr_sl: float, max_holding: int):
-    fee = fee_bps/1e4
-    slp = slippage_bps/1e4
+from .labeling.triple_barrier import first_touch_tables
+
+CHUNK_CELLS = 1 << 22  # จำนวนช่อง (entry x max_holding) ต่อ chunk ของ kernel first-touch
+
+# เทรดแบบ structured array: แท่งเข้า/ออก (ตำแหน่งใน prices), ฝั่ง (+1/-1),
+# เหตุออก (1 = แตะ tp, -1 = แตะ sl, 0 = ครบ max_holding), ผลตอบแทนสุทธิ
+TRADE_DTYPE = np.dtype([("i_in", np.int64), ("i_out", np.int64), ("side", np.int8), ("kind", np.int8),
+                        ("ret", np.float64)])
+TIES = ("sl", "tp", "ohlc")
 
+def run_backtest(prices: pd.DataFrame, proba: np.ndarray, thr: float, fee_bps: float, slippage_bps: float, atr_tp: float, atr_sl: float, max_holding: int,
+                 engine: str="vector", price_mode: str="close", tie: str="sl"):
+    """
+    engine="vector": หา first-touch ของทุกจุดเข้าที่เป็นไปได้พร้อมกัน (backtest_arrays)
+    engine="loop": เดินทีละแท่งแบบเดิม (ไว้อ้างอิง); สองแบบให้เทรดและ metrics ตรงกันทุกบิต
+    price_mode="intrabar": ตรวจ tp/sl ด้วย high/low ของแท่ง (prices ต้องมี high/low, tie="ohlc" ต้องมี open)
+    ออกที่ราคา barrier; metrics เพิ่ม intrabar_changed = จำนวนเทรดที่แท่งออกหรือเหตุออกต่างจากโหมด close
+    คืน (metrics, DataFrame t_in/t_out/side/ret)
+    """
     close = prices["close"].to_numpy()
     atr = prices["atr"].to_numpy()
-    ts = prices["timestamp"].to_numpy()
+    side = signals(proba, thr)
+    if price_mode not in ("close", "intrabar"):
+        raise ValueError(f"Unknown price mode: {price_mode}")
+    intrabar = price_mode == "intrabar"
+    if engine == "vector":
+        bars = {}
+        if intrabar:
+            bars = {"high": prices["high"].to_numpy(), "low": prices["low"].to_numpy(), "tie": tie,
+                    "open_": prices["open"].to_numpy() if tie == "ohlc" else None}
+        tr = backtest_arrays(close, atr, side, fee_bps, slippage_bps, atr_tp, atr_sl, max_holding, **bars)
+    elif engine == "loop":
+        if intrabar:
+            raise ValueError("price_mode 'intrabar' needs engine 'vector'")
+        tr = _loop_trades(close, atr, side, fee_bps, slippage_bps, atr_tp, atr_sl, max_holding)
+    else:
+        raise ValueError(f"Unknown backtest engine: {engine}")
+
+    if len(tr) == 0:
+        return {"trades": 0}, pd.DataFrame()
+    metrics = trade_metrics(tr["ret"])
+    if intrabar:
+        metrics["intrabar_changed"] = intrabar_changes(close, atr, tr, slippage_bps, atr_tp, atr_sl, max_holding)
+    return metrics, trades_frame(tr, prices["timestamp"])
+
+def signals(proba: np.ndarray, thr: float) -> np.ndarray:
+    """ฝั่งสัญญาณต่อแท่ง: +1 long, -1 short, 0 ไม่เข้า (proba คอลัมน์ 0 = short, 2 = long)"""
+    longs, shorts = proba[:, 2], proba[:, 0]
+    return np.where((longs >= thr) & (longs > shorts), 1, np.where((shorts >= thr) & (shorts > longs), -1, 0)).astype(np.int8)
+
+def entry_levels(close: np.ndarray, atr: np.ndarray, side: np.ndarray, slippage_bps: float, atr_tp: float, atr_sl: float):
+    """(px_in, tp, sl) ของจุดเข้าแต่ละจุด; ลำดับการคำนวณเดียวกับลูปเดิม (ผลเท่ากันทุกบิต)"""
+    slp = slippage_bps/1e4
+    long = side == 1
+    px_in = close*np.where(long, 1+slp, 1-slp)
+    tp = np.where(long, px_in*(1 + (atr_tp*atr/px_in)), px_in*(1 - (atr_tp*atr/px_in)))
+    sl = np.where(long, px_in*(1 - (atr_sl*atr/px_in)), px_in*(1 + (atr_sl*atr/px_in)))
+    return px_in, tp, sl
+
+def first_exits(close: np.ndarray, idx: np.ndarray, side: np.ndarray, tp: np.ndarray, sl: np.ndarray, max_holding: int,
+                chunk_cells: int=CHUNK_CELLS, high: np.ndarray=None, low: np.ndarray=None, tie: str="sl",
+                open_: np.ndarray=None):
+    """
+    แท่งออกของจุดเข้า idx (ฝั่ง side, ระดับ tp/sl): แท่งแรกใน i+1 .. i+max_holding ที่แตะ tp หรือ sl
+    ไม่แตะ = min(i + max_holding, N-1); ทำทีละ chunk บน sliding-window view ของราคา
+    ปกติใช้ close; ให้ high/low = แตะเมื่อ high >= ระดับบน หรือ low <= ระดับล่าง ภายในแท่ง
+    แตะทั้งสองระดับในแท่งเดียวกัน: tie="sl" / "tp" เลือกตามชื่อ, "ohlc" = แท่งเขียว (close >= open) วิ่ง O-L-H-C
+    (แตะล่างก่อน) แท่งแดงวิ่ง O-H-L-C (แตะบนก่อน)
+    คืน (exit, kind) kind: 1 = tp, -1 = sl, 0 = ครบ max_holding
+    """
+    if tie not in TIES:
+        raise ValueError(f"Unknown tie-break: {tie}")
+    if tie == "ohlc" and high is not None and open_ is None:
+        raise ValueError("tie 'ohlc' needs open prices")
+    N, H = len(close), int(max_holding)
+    idx = np.asarray(idx, dtype=np.int64)
+    out = np.minimum(idx + H, N - 1)
+    kind = np.zeros(len(idx), dtype=np.int8)
+    if H <= 0 or len(idx) == 0:
+        return out, kind
+    # pad ท้ายด้วย NaN (เทียบแล้วเป็น False) ให้ทุกแท่งมีหน้าต่างยาว H
+    pad = np.full(H, np.nan)
+    up_src, dn_src = (close, close) if high is None else (high, low)
+    wu = sliding_window_view(np.concatenate((up_src[1:], pad)), H)
+    wd = wu if high is None else sliding_window_view(np.concatenate((dn_src[1:], pad)), H)
+    long = side == 1
+    # ระดับบน/ล่าง: long = tp/sl, short = sl/tp; แตะบนก่อน -> long ได้ tp, short โดน sl
+    hi, lo = np.where(long, tp, sl), np.where(long, sl, tp)
+    k_up = np.where(long, 1, -1).astype(np.int8)
+    step = max(1, chunk_cells // H)
+    for a in range(0, len(idx), step):
+        b = min(a + step, len(idx))
+        f_up = _first_hit(wu[idx[a:b]] >= hi[a:b, None])
+        f_dn = _first_hit(wd[idx[a:b]] <= lo[a:b, None])
+        first = np.minimum(f_up, f_dn)
+        touched = first < H
+        up_first = f_up < f_dn
+        both = touched & (f_up == f_dn)
+        if tie == "ohlc" and open_ is not None:
+            j = np.minimum(idx[a:b] + 1 + first, N - 1)
+            up_first |= both & (close[j] < open_[j])
+        elif tie == "tp":
+            up_first |= both & long[a:b]
+        else:
+            up_first |= both & ~long[a:b]
+        out[a:b] = np.where(touched, idx[a:b] + 1 + first, out[a:b])
+        kind[a:b] = np.where(touched, np.where(up_first, k_up[a:b], -k_up[a:b]), 0)
+    return out, kind
+
+def _first_hit(hit: np.ndarray) -> np.ndarray:
+    """offset แรกที่เป็น True ในแต่ละแถว; ไม่มี = ความยาวแถว"""
+    first = hit.argmax(axis=1)
+    first[~hit[np.arange(len(hit)), first]] = hit.shape[1]
+    return first
+
+def resolve_trades(idx: np.ndarray, exits: np.ndarray) -> np.ndarray:
+    """
+    ลำดับเทรดที่ไม่ทับกัน: เริ่มที่จุดเข้าแรก แล้วจุดถัดไป = จุดเข้าแรกหลังแท่งออก
+    คืนตำแหน่ง (ใน idx) ของจุดเข้าที่ถูกใช้; เดินตาม pointer แบบ doubling (log2(จำนวนเทรด) รอบ, ไม่มีลูปต่อแท่ง)
+    """
+    n = len(idx)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    # jump[k] = จุดเข้าถัดไปหลังเทรดที่เข้าที่ k; n = จบ (ชี้กลับตัวเอง)
+    jump = np.append(np.searchsorted(idx, exits + 1, side="left"), n)
+    sel = np.zeros(1, dtype=np.int64)   # จุดบนเส้นทางจาก 0 ที่ก้าว [0, 2^t); jump = ก้าวละ 2^t
+    while sel[-1] < n:
+        sel = np.concatenate((sel, jump[sel]))
+        jump = jump[jump]
+    return sel[:np.searchsorted(sel, n)]
+
+def backtest_arrays(close: np.ndarray, atr: np.ndarray, side: np.ndarray, fee_bps: float, slippage_bps: float,
+                    atr_tp: float, atr_sl: float, max_holding: int, chunk_cells: int=CHUNK_CELLS,
+                    high: np.ndarray=None, low: np.ndarray=None, tie: str="sl", open_: np.ndarray=None) -> np.ndarray:
+    """
+    engine แบบ array: คืนเทรดเป็น structured array (TRADE_DTYPE) เรียงตามเวลา
+    high/low = intrabar (ดู first_exits): เทรดที่แตะ barrier ออกที่ราคา tp/sl แทน close ของแท่งนั้น
+    """
+    N = len(close)
+    idx = np.flatnonzero(side[:max(N - 1, 0)])
+    s = side[idx]
+    px_in, tp, sl = entry_levels(close[idx], atr[idx], s, slippage_bps, atr_tp, atr_sl)
+    exits, kind = first_exits(close, idx, s, tp, sl, max_holding, chunk_cells, high, low, tie, open_)
+    k = resolve_trades(idx, exits)
+    px_exit = None if high is None else np.where(kind[k] == 1, tp[k], np.where(kind[k] == -1, sl[k], close[exits[k]]))
+    return _trades(close, idx[k], exits[k], s[k], px_in[k], fee_bps, slippage_bps, kind[k], px_exit)
+
+def intrabar_changes(close: np.ndarray, atr: np.ndarray, tr: np.ndarray, slippage_bps: float, atr_tp: float,
+                     atr_sl: float, max_holding: int) -> int:
+    """จำนวนเทรด intrabar ที่ถ้าตรวจด้วย close อย่างเดียว (จุดเข้าเดิม) จะออกคนละแท่งหรือคนละเหตุ"""
+    _, tp, sl = entry_levels(close[tr["i_in"]], atr[tr["i_in"]], tr["side"], slippage_bps, atr_tp, atr_sl)
+    exits, kind = first_exits(close, tr["i_in"], tr["side"], tp, sl, max_holding)
+    return int(((exits != tr["i_out"]) | (kind != tr["kind"])).sum())
 
-    longs = proba[:,2]
-    shorts = proba[:,0]
+def _trades(close, i_in, i_out, side, px_in, fee_bps, slippage_bps, kind=None, px_exit=None) -> np.ndarray:
+    """px_exit: ราคาออกก่อน slippage (None = close ของแท่งออก)"""
+    fee, slp = fee_bps/1e4, slippage_bps/1e4
+    px_out = (close[i_out] if px_exit is None else px_exit)*np.where(side == 1, 1 - slp, 1 + slp)
+    tr = np.empty(len(i_in), dtype=TRADE_DTYPE)
+    tr["i_in"], tr["i_out"], tr["side"] = i_in, i_out, side
+    tr["kind"] = 0 if kind is None else kind
+    tr["ret"] = (px_out/px_in - 1)*side - 2*fee
+    return tr
 
+def _loop_trades(close, atr, side, fee_bps, slippage_bps, atr_tp, atr_sl, max_holding) -> np.ndarray:
+    """engine เดิม: เดินทีละแท่ง สแกน close ล่วงหน้าทีละจุดเข้า"""
+    slp = slippage_bps/1e4
     i = 0
     N = len(close)
-    trades = []
+    i_in, i_out, sides, px_ins, kinds = [], [], [], [], []
     while i < N-1:
-        long_sig = (longs[i]>=thr) and (longs[i]>shorts[i])
-        short_sig= (shorts[i]>=thr) and (shorts[i]>longs[i])
-        if not (long_sig or short_sig):
+        if side[i] == 0:
             i += 1
             continue
-        side = 1 if long_sig else -1
-        px_in = close[i]*(1+slp if side==1 else 1-slp)
-        tp = px_in*(1 + (atr_tp*atr[i]/px_in)) if side==1 else px_in*(1 - (atr_tp*atr[i]/px_in))
-        sl = px_in*(1 - (atr_sl*atr[i]/px_in)) if side==1 else px_in*(1 + (atr_sl*atr[i]/px_in))
+        s = int(side[i])
+        px_in = close[i]*(1+slp if s==1 else 1-slp)
+        tp = px_in*(1 + (atr_tp*atr[i]/px_in)) if s==1 else px_in*(1 - (atr_tp*atr[i]/px_in))
+        sl = px_in*(1 - (atr_sl*atr[i]/px_in)) if s==1 else px_in*(1 + (atr_sl*atr[i]/px_in))
 
-        hit = None
+        hit, kind = None, 0
         for j in range(i+1, min(i+1+max_holding, N)):
             px = close[j]
-            if side==1 and (px>=tp or px<=sl): hit=j; break
-            if side==-1 and (px<=tp or px>=sl): hit=j; break
+            if s==1 and (px>=tp or px<=sl): hit=j; kind = -1 if px<=sl else 1; break
+            if s==-1 and (px<=tp or px>=sl): hit=j; kind = -1 if px>=sl else 1; break
         if hit is None: hit = min(i+max_holding, N-1)
-
-        px_out = close[hit]*(1 - slp if side==1 else 1 + slp)
-        ret = (px_out/px_in - 1)*side - 2*fee
-        trades.append({"t_in":ts[i], "t_out":ts[hit], "side":side, "ret":ret})
+        i_in.append(i); i_out.append(hit); sides.append(s); px_ins.append(px_in); kinds.append(kind)
         i = hit + 1
 
-    if not trades:
-        return {"trades": 0}, pd.DataFrame()
-    df_t = pd.DataFrame(trades)
-    wins = (df_t["ret"]>0).sum()
-    losses = (df_t["ret"]<0).sum()
-    wr = wins/len(df_t)
-    pf = (df_t.loc[df_t["ret"]>0,"ret"].sum())/(-df_t.loc[df_t["ret"]<0,"ret"].sum()) if losses>0 else float("inf")
-    avg_win = df_t.loc[df_t["ret"]>0,"ret"].mean() if wins>0 else 0.0
-    avg_loss= -df_t.loc[df_t["ret"]<0,"ret"].mean() if losses>0 else 0.0
+    return _trades(close, np.array(i_in, dtype=np.int64), np.array(i_out, dtype=np.int64),
+                   np.array(sides, dtype=np.int8), np.array(px_ins, dtype=close.dtype), fee_bps, slippage_bps,
+                   np.array(kinds, dtype=np.int8))
+
+def trades_frame(tr: np.ndarray, timestamps: pd.Series) -> pd.DataFrame:
+    """structured array -> DataFrame (t_in, t_out, side, ret) รูปแบบเดียวกับ trades_w{k}.parquet"""
+    ts = timestamps.reset_index(drop=True)
+    return pd.DataFrame({"t_in": ts.iloc[tr["i_in"]].reset_index(drop=True),
+                         "t_out": ts.iloc[tr["i_out"]].reset_index(drop=True),
+                         "side": tr["side"].astype(np.int64), "ret": tr["ret"]})
+
+def trade_metrics(ret: np.ndarray) -> dict:
+    """metrics จากผลตอบแทนรายเทรด (อย่างน้อย 1 เทรด) ลำดับการคำนวณเดียวกับเวอร์ชัน pandas เดิม"""
+    ret = np.asarray(ret, dtype=np.float64)
+    pos, neg = ret[ret>0], ret[ret<0]
+    wins, losses = len(pos), len(neg)
+    wr = wins/len(ret)
+    pf = pos.sum()/(-neg.sum()) if losses>0 else float("inf")
+    avg_win = pos.mean() if wins>0 else 0.0
+    avg_loss= -neg.mean() if losses>0 else 0.0
     rr = (avg_win/avg_loss) if avg_loss>0 else 0.0
-    eq = (1+df_t["ret"]).cumprod()
-    dd = float((eq/eq.cummax()-1).min())
-    metrics = {
-        "trades": int(len(df_t)),
+    eq = np.cumprod(1+ret)
+    dd = float((eq/np.maximum.accumulate(eq)-1).min())
+    return {
+        "trades": int(len(ret)),
         "win_rate": float(wr),
         "profit_factor": float(pf),
         "rr": float(rr),
-        "total_return_equity": float(eq.iloc[-1]-1),
+        "total_return_equity": float(eq[-1]-1),
         "max_drawdown": dd
     }
-    return metrics, df_t
+
+# พารามิเตอร์ของ grid_backtest (ชื่อเดียวกับ trade: ใน config) และคอลัมน์ metrics ของตารางผล
+GRID_KEYS = ["proba_threshold", "atr_mult_tp", "atr_mult_sl", "max_holding", "fee_bps", "slippage_bps"]
+METRIC_COLS = ["trades", "win_rate", "profit_factor", "rr", "total_return_equity", "max_drawdown"]
+# ทุกคีย์ที่ run_backtest อาจใส่ใน metrics (backtest_only ไม่ยกค่าเหล่านี้จาก metrics เดิม)
+BACKTEST_KEYS = METRIC_COLS + ["intrabar_changed"]
+
+def grid_backtest(windows: dict, grid: dict, base: dict=None, workers: int=1) -> pd.DataFrame:
+    """
+    backtest ทุกชุดพารามิเตอร์ใน grid (GRID_KEYS; คีย์ที่ไม่มีใช้ค่าจาก base เช่น cfg["trade"]) ของทุก window
+    windows: {k: (prices ที่มี close/atr, proba)}; workers > 1 = กระจาย window ไปหลาย process (0 = ทุก core)
+    คืนตาราง tidy หนึ่งแถวต่อ (window, ชุดพารามิเตอร์); ผลแต่ละแถวเท่ากับ run_backtest ของชุดนั้นทุกบิต
+    base["price_mode"] = "intrabar" ใช้ high/low (และ open เมื่อ intrabar_tie = "ohlc") เหมือน run_backtest
+    """
+    base = base or {}
+    values = {key: list(grid[key]) if key in grid else [base[key]] for key in GRID_KEYS}
+    intrabar = base.get("price_mode", "close") == "intrabar"
+    tie = base.get("intrabar_tie", "sl")
+    if tie not in TIES:
+        raise ValueError(f"Unknown tie-break: {tie}")
+    values["tie"] = tie
+    cols = ["close", "atr"] + (["high", "low"] + (["open"] if tie == "ohlc" else []) if intrabar else [])
+    items = [(k, {c: prices[c].to_numpy() for c in cols}, proba) for k, (prices, proba) in windows.items()]
+    workers = int(workers) or (os.cpu_count() or 1)
+    if workers > 1 and len(items) > 1:
+        with ProcessPoolExecutor(min(workers, len(items)), mp_context=mp.get_context("spawn")) as ex:
+            parts = list(ex.map(_grid_window, *zip(*items), itertools.repeat(values)))
+    else:
+        parts = [_grid_window(*it, values) for it in items]
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=["window"] + GRID_KEYS + METRIC_COLS)
+
+def _grid_window(k, bars: dict, proba: np.ndarray, values: dict) -> pd.DataFrame:
+    """
+    ทุกชุดของหนึ่ง window: ตาราง first-touch (offset แรกที่ราคา >= / <= ระดับ) คำนวณครั้งเดียวต่อ slippage
+    ที่ max_holding สูงสุด แล้วใช้ร่วมกันทุก threshold / tp / sl / max_holding / fee
+    bars: close/atr (+ high/low/open ในโหมด intrabar: ตารางบนใช้ high ตารางล่างใช้ low, ออกที่ราคา barrier)
+    """
+    close, atr = bars["close"], bars["atr"]
+    intrabar = "high" in bars
+    N = len(close)
+    Hmax = max(int(h) for h in values["max_holding"])
+    tps, sls = values["atr_mult_tp"], values["atr_mult_sl"]
+    # จุดเข้าที่เป็นไปได้ต่อ threshold (ไม่ขึ้นกับพารามิเตอร์อื่น)
+    cands = {}
+    for thr in values["proba_threshold"]:
+        side = signals(proba, thr)
+        idx = np.flatnonzero(side[:max(N - 1, 0)])
+        cands[thr] = (idx, side[idx], side[idx] == 1)
+    rows = []
+    for slp_bps in values["slippage_bps"]:
+        long, short = np.ones(N, dtype=np.int8), -np.ones(N, dtype=np.int8)
+        lv_l = {m: entry_levels(close, atr, long, slp_bps, m, m) for m in set(tps) | set(sls)}
+        lv_s = {m: entry_levels(close, atr, short, slp_bps, m, m) for m in set(tps) | set(sls)}
+        px_in = {1: lv_l[tps[0]][0], -1: lv_s[tps[0]][0]}
+        # long: แตะบน = tp, แตะล่าง = sl; short: แตะล่าง = tp, แตะบน = sl
+        uppers = [lv_l[m][1] for m in tps] + [lv_s[m][2] for m in sls]
+        lowers = [lv_l[m][2] for m in sls] + [lv_s[m][1] for m in tps]
+        up, dn = first_touch_tables(bars.get("high", close), bars.get("low", close), uppers, lowers, max(Hmax, 1))
+        up_tp_l, up_sl_s = dict(zip(tps, up[:len(tps)])), dict(zip(sls, up[len(tps):]))
+        dn_sl_l, dn_tp_s = dict(zip(sls, dn[:len(sls)])), dict(zip(tps, dn[len(sls):]))
+        i = np.arange(N)
+        for tp, sl, h in itertools.product(tps, sls, values["max_holding"]):
+            h = int(h)
+            fl, fs = np.minimum(up_tp_l[tp], dn_sl_l[sl]), np.minimum(dn_tp_s[tp], up_sl_s[sl])
+            timeout = np.minimum(i + h, N - 1)
+            ex_l = np.where(fl < h, i + 1 + fl, timeout)
+            ex_s = np.where(fs < h, i + 1 + fs, timeout)
+            if intrabar:
+                # ราคาออกก่อน slippage: tp/sl ตามเหตุออก (ตัดสินแท่งที่แตะทั้งคู่ด้วย tie) หรือ close เมื่อครบ h
+                px_l = _exit_price(close, bars, ex_l, fl < h, up_tp_l[tp], dn_sl_l[sl], lv_l[tp][1], lv_l[sl][2],
+                                   values["tie"], True)
+                px_s = _exit_price(close, bars, ex_s, fs < h, dn_tp_s[tp], up_sl_s[sl], lv_s[tp][1], lv_s[sl][2],
+                                   values["tie"], False)
+            for thr in values["proba_threshold"]:
+                idx, s, is_long = cands[thr]
+                exits = np.where(is_long, ex_l[idx], ex_s[idx])
+                sel = resolve_trades(idx, exits)
+                i_in, i_out, s = idx[sel], exits[sel], s[sel]
+                p_in = np.where(is_long[sel], px_in[1][i_in], px_in[-1][i_in])
+                p_out = np.where(is_long[sel], px_l[i_in], px_s[i_in]) if intrabar else None
+                for fee in values["fee_bps"]:
+                    tr = _trades(close, i_in, i_out, s, p_in, fee, slp_bps, px_exit=p_out)
+                    m = trade_metrics(tr["ret"]) if len(tr) else {"trades": 0}
+                    rows.append({"window": k, "proba_threshold": thr, "atr_mult_tp": tp, "atr_mult_sl": sl,
+                                 "max_holding": h, "fee_bps": fee, "slippage_bps": slp_bps, **m})
+    return pd.DataFrame(rows, columns=["window"] + GRID_KEYS + METRIC_COLS)
+
+def _exit_price(close, bars, exits, touched, f_tp, f_sl, tp, sl, tie: str, long: bool) -> np.ndarray:
+    """ราคาออก intrabar ของทุกแท่งเข้า (ฝั่งเดียว) จากตาราง offset แรกที่แตะ tp / sl; กติกาเดียวกับ first_exits"""
+    tp_first = f_tp < f_sl
+    both = touched & (f_tp == f_sl)
+    if tie == "ohlc" and "open" in bars:
+        # แท่งเขียววิ่ง O-L-H-C: แตะล่างก่อน = long โดน sl, short ได้ tp
+        green = close[exits] >= bars["open"][exits]
+        tp_first |= both & (green != long)
+    elif tie == "tp":
+        tp_first |= both
+    return np.where(touched, np.where(tp_first, tp, sl), close[exits])
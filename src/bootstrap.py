@@ -0,0 +1,148 @@
+"""
+ช่วงความเชื่อมั่นของ metrics จากการสุ่มซ้ำผลตอบแทนรายเทรด (config: bootstrap.*)
+- method="block": moving-block bootstrap แบบวน (block ยาว block_len เทรด เก็บ autocorrelation ระยะสั้น; 1 = iid)
+- method="shuffle": สลับลำดับเทรด (Monte-Carlo ของเส้นทาง equity: กระทบ max_drawdown,
+  profit_factor / total_return ไม่เปลี่ยนเพราะเป็นผลรวม/ผลคูณของชุดเดิม)
+ทุก resample คำนวณพร้อมกันเป็นเมทริกซ์: block ใช้สถิติต่อ block ที่คำนวณไว้ล่วงหน้า ([n_resamples, n_blocks])
+shuffle จำลองเส้นทาง log equity [n_resamples, n_trades] ทีละ chunk
+"""
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .backtest import trade_metrics
+
+CHUNK_CELLS = 1 << 20       # จำนวนช่อง (resample x block/เทรด) ต่อ chunk
+METRICS = ["profit_factor", "total_return_equity", "max_drawdown", "win_rate"]
+
+def block_length(n: int, block_len: int=0) -> int:
+    """ความยาว block (เทรด); block_len 0 = ~n^(1/3)"""
+    return min(int(block_len) or max(1, round(n ** (1 / 3))), n)
+
+def resample_index(n: int, n_resamples: int, method: str="block", block_len: int=0, rng=None) -> np.ndarray:
+    """index เทรด [n_resamples, n] ของแต่ละ resample (ใช้ตรวจ/วาดเส้นทาง; bootstrap() ไม่ต้องสร้างเมทริกซ์นี้)"""
+    rng = np.random.default_rng(rng)
+    if method == "shuffle":
+        return rng.permuted(np.tile(np.arange(n), (n_resamples, 1)), axis=1)
+    if method != "block":
+        raise ValueError(f"Unknown resample method: {method}")
+    b = block_length(n, block_len)
+    starts = rng.integers(0, n, size=(n_resamples, -(-n // b)))
+    return ((starts[:, :, None] + np.arange(b)) % n).reshape(n_resamples, -1)[:, :n]
+
+def resample_metrics(R: np.ndarray) -> dict:
+    """metrics ของทุกแถวของ R [resample, เทรด] (นิยามเดียวกับ trade_metrics)"""
+    pos = np.where(R > 0, R, 0.0).sum(axis=1)
+    neg = np.where(R < 0, R, 0.0).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pf = np.where(neg < 0, pos / -neg, np.inf)
+    eq = np.cumprod(1 + R, axis=1)
+    dd = (eq / np.maximum.accumulate(eq, axis=1) - 1).min(axis=1)
+    return {"profit_factor": pf, "total_return_equity": eq[:, -1] - 1, "max_drawdown": dd,
+            "win_rate": (R > 0).mean(axis=1)}
+
+BLOCK_STATS = ("pos", "neg", "win", "tot", "hi", "lo", "dd")
+
+def block_stats(ret: np.ndarray, b: int) -> np.ndarray:
+    """
+    สถิติของ block ยาว 1..b ที่เริ่มทุกตำแหน่ง s (วนรอบ) ในรูป log equity c_j = sum log1p(ret[s..s+j-1]), j>=1
+    ตามลำดับ BLOCK_STATS: pos/neg/win (ผลรวมกำไร/ขาดทุน/จำนวนเทรดชนะ), tot (c_j), hi/lo (max/min c),
+    dd (drawdown ภายใน block); คืน [7, n*b] โดยช่อง s*b + j-1 = block ยาว j ที่เริ่มที่ s
+    """
+    w = sliding_window_view(np.concatenate([ret, ret[:b - 1]]), b)
+    c = np.cumsum(np.log1p(w), axis=1)
+    peak = np.maximum.accumulate(c, axis=1)
+    st = [np.cumsum(np.where(w > 0, w, 0.0), axis=1), np.cumsum(np.where(w < 0, w, 0.0), axis=1),
+          np.cumsum(w > 0, axis=1), c, peak, np.minimum.accumulate(c, axis=1), np.minimum.accumulate(c - peak, axis=1)]
+    return np.stack(st).reshape(len(st), -1)
+
+def _block_draws(st: np.ndarray, n: int, b: int, starts: np.ndarray) -> dict:
+    """
+    metrics ของ resample ที่ต่อ block ตาม starts [resample, block] (block สุดท้ายยาว n - (nb-1)b)
+    drawdown รวมข้าม block: ระดับต้น block L = ผลรวม tot ก่อนหน้า, peak ก่อน block P = max(L' + hi') ของ block ก่อนหน้า
+    -> dd = min(L + lo - P, dd ภายใน block); peak เริ่มหลังเทรดแรกเหมือน trade_metrics
+    """
+    j = np.full(starts.shape[1], b - 1)
+    j[-1] = n - (starts.shape[1] - 1) * b - 1
+    pos, neg, win, tot, hi, lo, dd = np.take(st, starts * b + j, axis=1)
+    L = np.cumsum(tot, axis=1) - tot
+    P = np.empty_like(L)
+    P[:, 0] = -np.inf
+    np.maximum.accumulate((L + hi)[:, :-1], axis=1, out=P[:, 1:])
+    dd = np.minimum(L + lo - P, dd).min(axis=1)
+    pos, neg = pos.sum(axis=1), neg.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pf = np.where(neg < 0, pos / -neg, np.inf)
+    return {"profit_factor": pf, "total_return_equity": np.expm1(L[:, -1] + tot[:, -1]),
+            "max_drawdown": np.expm1(dd), "win_rate": win.sum(axis=1) / n}
+
+def _shuffle_drawdown(ret: np.ndarray, n_resamples: int, rng) -> np.ndarray:
+    """
+    max_drawdown ของ n_resamples ลำดับสลับของ ret (log equity, ทีละ chunk)
+    สุ่มลำดับด้วย sort ของ (key สุ่ม 32 บิต << 32 | index) ใน uint64 (np.sort เร็วกว่า argsort/permuted มาก)
+    """
+    n, lr = len(ret), np.log1p(ret)
+    idx = np.arange(n, dtype=np.uint64)
+    step = max(1, CHUNK_CELLS // n)
+    out = np.empty(n_resamples)
+    for a in range(0, n_resamples, step):
+        k = rng.integers(0, 1 << 32, size=(min(step, n_resamples - a), n), dtype=np.uint32).astype(np.uint64)
+        k <<= 32
+        k |= idx
+        k.sort(axis=1)
+        k &= 0xFFFFFFFF
+        c = lr[k.astype(np.intp)]
+        np.cumsum(c, axis=1, out=c)
+        out[a:a + len(c)] = (c - np.maximum.accumulate(c, axis=1)).min(axis=1)
+    return np.expm1(out)
+
+def bootstrap(ret: np.ndarray, n_resamples: int=2000, method: str="block", block_len: int=0, ci: float=0.95,
+              seed=0) -> pd.DataFrame:
+    """
+    ช่วงความเชื่อมั่นแบบ percentile ของ METRICS จากผลตอบแทนรายเทรด ret
+    คืน DataFrame แถวละ metric: point (ค่าจากชุดจริง), lo, hi, std
+    """
+    ret = np.asarray(ret, dtype=np.float64)
+    n = len(ret)
+    if n == 0:
+        return pd.DataFrame({"metric": METRICS, "point": np.nan, "lo": np.nan, "hi": np.nan, "std": np.nan})
+    rng = np.random.default_rng(seed)
+    point = trade_metrics(ret)
+    if method == "shuffle":
+        # ลำดับไม่กระทบผลรวม/ผลคูณ: มีแค่ max_drawdown ที่ต้องจำลอง
+        draws = {m: np.full(n_resamples, point[m]) for m in METRICS}
+        draws["max_drawdown"] = _shuffle_drawdown(ret, n_resamples, rng)
+    elif method == "block":
+        b = block_length(n, block_len)
+        st, nb = block_stats(ret, b), -(-n // b)
+        step = max(1, CHUNK_CELLS // nb)
+        parts = [_block_draws(st, n, b, rng.integers(0, n, size=(min(step, n_resamples - a), nb)))
+                 for a in range(0, n_resamples, step)]
+        draws = {m: np.concatenate([p[m] for p in parts]) for m in METRICS}
+    else:
+        raise ValueError(f"Unknown resample method: {method}")
+    q = [(1 - ci) / 2, (1 + ci) / 2]
+    rows = []
+    for m in METRICS:
+        x = draws[m]
+        # inverted_cdf ไม่ interpolate จึงรับ inf ได้ (profit_factor เมื่อ resample ไม่มีเทรดขาดทุน)
+        lo, hi = np.quantile(x, q, method="inverted_cdf")
+        fin = x[np.isfinite(x)]
+        rows.append({"metric": m, "point": point[m], "lo": float(lo), "hi": float(hi),
+                     "std": float(fin.std()) if len(fin) else np.nan})
+    return pd.DataFrame(rows)
+
+def bootstrap_windows(rets: dict, **kw) -> pd.DataFrame:
+    """
+    bootstrap ต่อ window ({k: ret}) และของประวัติเทรดทั้งหมดต่อกันตามลำดับ window (window = "all")
+    คืนตาราง tidy: window, trades, metric, point, lo, hi, std
+    """
+    items = list(rets.items()) + [("all", np.concatenate([np.asarray(r, dtype=np.float64) for r in rets.values()])
+                                   if rets else np.empty(0))]
+    out = []
+    for k, r in items:
+        t = bootstrap(r, **kw)
+        t.insert(0, "trades", len(r))
+        t.insert(0, "window", k)
+        out.append(t)
+    return pd.concat(out, ignore_index=True)
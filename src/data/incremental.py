@@ -0,0 +1,186 @@
+import glob
+import hashlib
+import json
+import os
+from pathlib import Path
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .load import load_files, concat_regular
+from .schema import to_prepared, from_prepared
+
+def file_hash(path: str, chunk: int=1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for b in iter(lambda: f.read(chunk), b""):
+            h.update(b)
+    return h.hexdigest()
+
+def file_entry(path: str) -> dict:
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": file_hash(path)}
+
+def load_manifest(path: str) -> dict:
+    p = Path(path)
+    if not p.exists():
+        return {}
+    with open(p, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(path: str, manifest: dict):
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, p)
+
+def diff_manifest(files: list, manifest: dict):
+    """
+    แยกไฟล์เป็น (ใหม่/เปลี่ยน, ไม่เปลี่ยน, ถูกลบ)
+    size+mtime ตรงกัน = ไม่เปลี่ยน (ไม่ต้องอ่านไฟล์); ถ้าไม่ตรงจึงค่อยเทียบ content hash
+    """
+    old = manifest.get("files", {})
+    changed, same = [], {}
+    for f in files:
+        st = os.stat(f)
+        e = old.get(f)
+        if e and e["size"] == st.st_size and e["mtime_ns"] == st.st_mtime_ns:
+            same[f] = e
+            continue
+        h = file_hash(f)
+        if e and e["sha256"] == h:
+            same[f] = dict(e, size=st.st_size, mtime_ns=st.st_mtime_ns)
+        else:
+            changed.append(f)
+    removed = sorted(set(old) - set(files))
+    return changed, same, removed
+
+def _settings(cfg_data: dict) -> dict:
+    keys = ("tz_source", "tz_target", "ensure_regular_5m", "fill_seams", "compact", "price_dtype", "price_scale")
+    return {k: cfg_data.get(k) for k in keys}
+
+def _range_entry(path: str, df: pd.DataFrame) -> dict:
+    e = file_entry(path)
+    if len(df):
+        e["t_min"] = df["timestamp"].min().isoformat()
+        e["t_max"] = df["timestamp"].max().isoformat()
+    return e
+
+def _span(e: dict):
+    return (pd.Timestamp(e["t_min"]), pd.Timestamp(e["t_max"])) if e and "t_min" in e else None
+
+def rebuild_spans(changed: dict, old: dict, same: dict):
+    """
+    ช่วงของ store เดิมที่ต้องลบแล้วสร้างใหม่ต่อไฟล์ที่เปลี่ยน: [t_min, t_min ของไฟล์ถัดไป)
+    (ครอบช่วงเดิม/ใหม่ของไฟล์ และแท่งที่ถูกเติมที่รอยต่อหลังไฟล์ซึ่ง forward-fill จากแท่งสุดท้ายของไฟล์นั้น)
+    changed = {path: (t_min, t_max) ใหม่ หรือ None}; คืน list ของ (lo, hi) หรือ None ถ้าช่วงไฟล์ทับกัน (ต้อง full)
+    """
+    spans = {}
+    for f, new in changed.items():
+        rng = [r for r in (new, _span(old.get(f))) if r]
+        if rng:
+            spans[f] = (min(r[0] for r in rng), max(r[1] for r in rng))
+    others = {f: r for f, e in same.items() if (r := _span(e))}
+    allr = {**others, **spans}
+    out = []
+    for f, (lo, hi) in spans.items():
+        if any(f != g and lo <= r[1] and r[0] <= hi for g, r in allr.items()):
+            return None
+        nxt = [r[0] for g, r in allr.items() if g != f and r[0] > hi]
+        out.append((lo, min(nxt) if nxt else None))
+    return out
+
+def _month_start(ts: pd.Timestamp) -> pd.Timestamp:
+    t = ts.tz_convert("UTC")
+    return pd.Timestamp(year=t.year, month=t.month, day=1, tz="UTC")
+
+def _read_store_times(table: pa.Table) -> pd.DatetimeIndex:
+    t = table.column("timestamp").to_numpy()
+    return pd.DatetimeIndex(pd.to_datetime(t, unit="ns", utc=True) if t.dtype.kind in "iu" else pd.to_datetime(t, utc=True))
+
+def incremental_update(cfg_data: dict, out_path: str, manifest_path: str,
+                       workers: int=1, executor: str="process", arrow_parquet: bool=False, engine: str="join"):
+    """
+    อัปเดต prepared parquet เฉพาะไฟล์ดิบที่ใหม่/เปลี่ยน ตาม manifest
+    คืน (df, info) โดย info บอกจำนวนไฟล์แต่ละประเภทและโหมดที่ใช้ ("full"/"incremental"/"noop")
+    สร้างใหม่ทั้งหมดเมื่อยังไม่มี store/manifest, มีไฟล์ถูกลบ, settings เปลี่ยน หรือช่วงเวลาของไฟล์ที่เปลี่ยนทับไฟล์อื่น
+    โหมด incremental: สร้างใหม่เฉพาะส่วนท้ายของ store ตั้งแต่ต้นเดือน (UTC) ของแท่งก่อนเวลาแรกที่เปลี่ยน
+    (ส่วนหัวคัดลอกเป็น Arrow table ไม่ผ่าน pandas/regularize); df ที่คืน = ส่วนท้ายนั้น, info["touched"] = ช่วงของมัน
+    ผลลัพธ์เท่ากับการสร้างใหม่ทั้งหมดเสมอ
+    """
+    files = sorted(glob.glob(cfg_data["raw_glob"]))
+    if not files:
+        raise FileNotFoundError(f"No files matched: {cfg_data['raw_glob']}")
+    tz_source, tz_target = cfg_data["tz_source"], cfg_data["tz_target"]
+    ensure_regular = cfg_data["ensure_regular_5m"]
+    fill_seams = bool(cfg_data.get("fill_seams", False))
+    load_kw = dict(workers=workers, executor=executor, arrow_parquet=arrow_parquet, engine=engine)
+
+    manifest = load_manifest(manifest_path)
+    changed, same, removed = diff_manifest(files, manifest)
+    full = (not Path(out_path).exists() or not manifest or removed
+            or manifest.get("settings") != _settings(cfg_data))
+    info = {"new_or_changed": len(changed), "unchanged": len(same), "removed": len(removed)}
+    if not full and not changed:
+        save_manifest(manifest_path, dict(manifest, files=same))
+        info["mode"] = "noop"
+        return None, info
+
+    dfs = load_files(files if full else changed, tz_source, tz_target, ensure_regular, **load_kw)
+    spans = None
+    if not full:
+        new_rng = {f: (d["timestamp"].min(), d["timestamp"].max()) if len(d) else None for f, d in zip(changed, dfs)}
+        spans = rebuild_spans(new_rng, manifest["files"], same)
+        if spans == []:
+            # ไฟล์ที่เปลี่ยนไม่มีแถวทั้งก่อนและหลัง: store ไม่เปลี่ยน
+            entries = dict(same, **{f: _range_entry(f, d) for f, d in zip(changed, dfs)})
+            save_manifest(manifest_path, dict(manifest, files=entries))
+            info["mode"] = "noop"
+            return None, info
+        if spans is None:
+            # ช่วงไฟล์ทับกัน: ไม่รู้ว่าแถวไหนเป็นของไฟล์ใด -> สร้างใหม่ทั้งหมด
+            changed_dfs = dict(zip(changed, dfs))
+            rest = load_files([f for f in files if f not in changed_dfs], tz_source, tz_target, ensure_regular,
+                              **load_kw)
+            loaded = dict(zip([f for f in files if f not in changed_dfs], rest), **changed_dfs)
+            dfs, full = [loaded[f] for f in files], True
+
+    if full:
+        df = concat_regular(dfs, tz_target, ensure_regular, engine, fill_seams)
+        entries = {f: _range_entry(f, d) for f, d in zip(files, dfs)}
+        info["mode"] = "full"
+        Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(out_path).with_suffix(".tmp")
+        to_prepared(df, cfg_data).to_parquet(tmp, index=False)
+        os.replace(tmp, out_path)
+    else:
+        table = pq.read_table(out_path)
+        ts = _read_store_times(table)
+        lo = min(a for a, _ in spans)
+        # ส่วนท้ายเริ่มที่ต้นเดือนของแท่งสุดท้ายก่อน lo (แท่งนั้นเป็นจุดตั้งต้นของ forward-fill)
+        seed = max(int(ts.searchsorted(lo, side="left")) - 1, 0)
+        a = int(ts.searchsorted(_month_start(ts[seed]), side="left")) if len(ts) else 0
+        if "__index_level_0__" in table.column_names:
+            table = table.drop_columns(["__index_level_0__"])
+        tail = from_prepared(table.slice(a).to_pandas(), cfg_data).reset_index(drop=True)
+        tail["timestamp"] = tail["timestamp"].dt.tz_convert(tz_target)   # compact store เก็บเป็น UTC
+        keep = pd.Series(True, index=tail.index)
+        for s_lo, s_hi in spans:
+            keep &= ~((tail["timestamp"] >= s_lo) & ((tail["timestamp"] < s_hi) if s_hi is not None else True))
+        df = concat_regular([tail[keep], *dfs], tz_target, ensure_regular, engine, fill_seams)
+        head = table.slice(0, a).replace_schema_metadata(None)
+        body = pa.Table.from_pandas(to_prepared(df, cfg_data), preserve_index=False)
+        body = body.replace_schema_metadata(None).cast(head.schema)
+        tmp = Path(out_path).with_suffix(".tmp")
+        pq.write_table(pa.concat_tables([head, body]), tmp)
+        os.replace(tmp, out_path)
+        info["touched"] = (df["timestamp"].iloc[0], df["timestamp"].iloc[-1])
+        info["rows"] = int(a + len(df))
+        entries = dict(same)
+        entries.update({f: _range_entry(f, d) for f, d in zip(changed, dfs)})
+        info["mode"] = "incremental"
+
+    save_manifest(manifest_path, {"settings": _settings(cfg_data), "files": entries})
+    return df, info
@@ -1,16 +1,35 @@
+import numpy as np
 import pandas as pd
 import glob
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+NEED_COLS = {"timestamp","open","high","low","close","volume"}
 
 def read_any(path: str) -> pd.DataFrame:
     if path.lower().endswith(".parquet"):
         return pd.read_parquet(path)
     return pd.read_csv(path)
 
-def ensure_regular_5m(df: pd.DataFrame, tz_source: str, tz_target: str) -> pd.DataFrame:
-    ts = pd.to_datetime(df["timestamp"])
+def read_parquet_dataset(path: str) -> pd.DataFrame:
+    """
+    Fast path สำหรับ parquet: อ่านผ่าน pyarrow.dataset (multi-threaded decode)
+    และตรวจคอลัมน์จาก schema ก่อนอ่านข้อมูลจริง
+    """
+    import pyarrow.dataset as ds
+    dset = ds.dataset(path, format="parquet")
+    miss = NEED_COLS - set(dset.schema.names)
+    if miss:
+        raise ValueError(f"{path} missing columns: {miss}")
+    return dset.to_table(use_threads=True).to_pandas()
+
+def _to_target_tz(col: pd.Series, tz_source: str, tz_target: str) -> pd.Series:
+    ts = pd.to_datetime(col)
     if ts.dt.tz is None:
         ts = ts.dt.tz_localize(tz_source)
-    ts = ts.dt.tz_convert(tz_target)
+    return ts.dt.tz_convert(tz_target)
+
+def _join_regular_5m(df: pd.DataFrame, tz_source: str, tz_target: str) -> pd.DataFrame:
+    ts = _to_target_tz(df["timestamp"], tz_source, tz_target)
     df = df.copy()
     df["timestamp"] = ts
     df = df.sort_values("timestamp").set_index("timestamp")
@@ -27,26 +46,173 @@ def ensure_regular_5m(df: pd.DataFrame, tz_source: str, tz_target: str) -> pd.Da
     df = df.dropna(subset=["close"])
     return df.reset_index().rename(columns={"index":"timestamp"})
 
-def load_all(raw_glob: str, tz_source: str, tz_target: str, ensure_regular: bool=True) -> pd.DataFrame:
+def _ffill_index(valid: np.ndarray) -> np.ndarray:
+    """ตำแหน่งแถวล่าสุดที่ valid (<= i) ของทุกแถว; 0 ถ้ายังไม่มี (แถว 0 ต้องเป็น NaN อยู่แล้ว)"""
+    idx = np.arange(len(valid))
+    idx[~valid] = 0
+    np.maximum.accumulate(idx, out=idx)
+    return idx
+
+def regularize_5m_epoch(df: pd.DataFrame, tz_source: str, tz_target: str):
+    """
+    เติมกริด 5m บน int64 epoch: slot = (ts - t0) // 5min แล้ว scatter ลง array ที่จองไว้
+    และ forward-fill ด้วยการแพร่ index (ไม่มี join/sort/copy ทั้งเฟรม)
+    คืน (df, จำนวนแท่งที่เติม) ผลลัพธ์ตรงกับ engine "join" ทุกบิต;
+    กรณีที่ scatter ให้ผลต่างไม่ได้ (timestamp ซ้ำ/NaT หรือคอลัมน์ไม่ใช่ตัวเลข) จะใช้ join แทน
+    """
+    ts = _to_target_tz(df["timestamp"], tz_source, tz_target)
+    cols = [c for c in df.columns if c != "timestamp"]
+    if ts.isna().any() or not all(isinstance(df[c].dtype, np.dtype) and df[c].dtype.kind in "fiu" for c in cols):
+        out = _join_regular_5m(df, tz_source, tz_target)
+        return out, int((~out["timestamp"].isin(ts)).sum())
+
+    unit = ts.dt.unit
+    step = int(np.timedelta64(5, "m") / np.timedelta64(1, unit))
+    t = pd.DatetimeIndex(ts).asi8
+    t0 = t.min()
+    pos, rem = np.divmod(t - t0, step)
+    on_grid = rem == 0
+    del rem
+    all_on = bool(on_grid.all())
+    if not all_on:
+        pos = pos[on_grid]
+    # ความยาวกริดเท่าช่วง date_range(t0, t.max()) ของ join (แถว off-grid หลัง slot สุดท้ายยังยืดกริด)
+    n = int((t.max() - t0) // step) + 1
+    present = np.zeros(n, dtype=bool)
+    present[pos] = True
+    n_present = int(np.count_nonzero(present))
+    if n_present != len(pos):
+        # timestamp ซ้ำบนกริด: join จะคงทุกแถวซ้ำไว้ -> ใช้ engine เดิมให้ผลตรงกัน
+        out = _join_regular_5m(df, tz_source, tz_target)
+        return out, int((~out["timestamp"].isin(ts)).sum())
+    n_filled = n - n_present
+
+    data = {}
+    for c in cols:
+        v = df[c].to_numpy()
+        if not all_on:
+            v = v[on_grid]
+        if n_filled == 0:
+            arr = np.empty(n, dtype=v.dtype)
+        else:
+            arr = np.full(n, np.nan, dtype=v.dtype if v.dtype.kind == "f" else np.float64)
+        arr[pos] = v
+        data[c] = arr
+
+    # ffill แบบ in-place: idx[i] <= i และแถวที่ valid ชี้ตัวเอง จึง gather ทับ array เดิมได้ตามลำดับ
+    # index ใช้ร่วมกันทุกคอลัมน์ราคา (คำนวณใหม่เฉพาะคอลัมน์ที่มี NaN ในต้นฉบับ)
+    base_idx = _ffill_index(present) if n_filled else None
+    for c in ["open","high","low","close"]:
+        arr = data.get(c)
+        if arr is None or arr.dtype.kind != "f":
+            continue
+        nan_src = bool(np.isnan(arr[pos]).any())
+        if base_idx is None and not nan_src:
+            continue
+        idx = _ffill_index(~np.isnan(arr)) if nan_src else base_idx
+        np.take(arr, idx, out=arr, mode="clip")
+    del base_idx, pos
+    if "volume" in data and data["volume"].dtype.kind == "f":
+        vol = data["volume"]
+        vol[np.isnan(vol)] = 0
+
+    grid = (t0 + step * np.arange(n, dtype=np.int64)).view(f"M8[{unit}]")
+    close = data["close"]
+    if close.dtype.kind == "f" and np.isnan(close[0]):
+        keep = ~np.isnan(close)
+        grid = grid[keep]
+        data = {c: a[keep] for c, a in data.items()}
+        n_filled = int(np.count_nonzero(~present[keep]))   # นับเฉพาะแท่งเติมที่เหลืออยู่ใน output
+    del present
+    stamp = pd.DatetimeIndex(grid).tz_localize("UTC").tz_convert(tz_target)
+    out = pd.DataFrame({"timestamp": stamp, **data}, copy=False)
+    return out, n_filled
+
+def ensure_regular_5m(df: pd.DataFrame, tz_source: str, tz_target: str, engine: str="join") -> pd.DataFrame:
+    """engine: "join" (เดิม) หรือ "epoch" (regularize_5m_epoch; หน่วยความจำต่ำกว่ามาก)"""
+    if engine == "epoch":
+        return regularize_5m_epoch(df, tz_source, tz_target)[0]
+    if engine != "join":
+        raise ValueError(f"Unknown engine: {engine}")
+    return _join_regular_5m(df, tz_source, tz_target)
+
+def load_one(path: str, tz_source: str, tz_target: str, ensure_regular: bool=True, arrow_parquet: bool=False,
+             engine: str="join") -> pd.DataFrame:
+    """
+    อ่าน + ตรวจ + normalize ไฟล์เดียว (ใช้เป็นหน่วยงานของ worker pool)
+    engine="epoch" จะบันทึกจำนวนแท่งที่เติมไว้ใน df.attrs["filled_bars"]
+    """
+    if arrow_parquet and path.lower().endswith(".parquet"):
+        df = read_parquet_dataset(path)
+    else:
+        df = read_any(path)
+    miss = NEED_COLS - set(df.columns)
+    if miss:
+        raise ValueError(f"{path} missing columns: {miss}")
+    if ensure_regular:
+        if engine == "epoch":
+            df, n_filled = regularize_5m_epoch(df, tz_source, tz_target)
+            df.attrs["filled_bars"] = n_filled
+            return df
+        return ensure_regular_5m(df, tz_source, tz_target, engine=engine)
+    ts = pd.to_datetime(df["timestamp"])
+    if ts.dt.tz is None:
+        ts = ts.dt.tz_localize(tz_source)
+    df = df.copy()
+    df["timestamp"] = ts.dt.tz_convert(tz_target)
+    return df.sort_values("timestamp")
+
+def load_files(files: list, tz_source: str, tz_target: str, ensure_regular: bool=True,
+               workers: int=1, executor: str="process", arrow_parquet: bool=False, engine: str="join") -> list:
+    """โหลดหลายไฟล์ คืน list ของ DataFrame ตามลำดับ `files` (workers > 1 = ใช้ pool)"""
+    args = (tz_source, tz_target, ensure_regular, arrow_parquet, engine)
+    workers = min(int(workers or 1), len(files))
+    if workers <= 1:
+        return [load_one(f, *args) for f in files]
+    if executor not in ("process", "thread"):
+        raise ValueError(f"Unknown executor: {executor}")
+    pool_cls = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    with pool_cls(max_workers=workers) as pool:
+        # map() คืนผลตามลำดับ input -> concat ลำดับเดียวกับ sequential
+        return list(pool.map(load_one, files, *[[a]*len(files) for a in args]))
+
+def concat_regular(dfs: list, tz_target: str, ensure_regular: bool=True, engine: str="join",
+                   fill_seams: bool=False) -> pd.DataFrame:
+    """
+    รวม frame ต่อไฟล์ (normalize แล้ว) เป็น series เดียว (ใช้ร่วมกันโดย load_all และ incremental_update)
+    fill_seams=False: concat แล้วเรียงตาม timestamp เหมือนเดิม (ไม่ลบแถวซ้ำ ไม่เติมช่องว่างระหว่างไฟล์)
+    fill_seams=True: timestamp ซ้ำใช้แถวของ frame หลังสุด แล้ว ensure_regular_5m ทั้งก้อน
+    เพื่อเติมช่องว่างระหว่างไฟล์ด้วย; engine="epoch": จำนวนแท่งที่เติม (ต่อไฟล์ + รอยต่อ) อยู่ใน attrs["filled_bars"]
+    """
+    filled = sum(d.attrs.get("filled_bars", 0) for d in dfs)
+    if not fill_seams:
+        df = pd.concat(dfs, ignore_index=True).sort_values("timestamp")
+        if engine == "epoch" and ensure_regular:
+            df.attrs["filled_bars"] = int(filled)
+        return df
+    df = (pd.concat(dfs, ignore_index=True)
+          .drop_duplicates("timestamp", keep="last")
+          .sort_values("timestamp", kind="stable")
+          .reset_index(drop=True))
+    if not ensure_regular or not len(df):
+        return df
+    if engine == "epoch":
+        df, n_filled = regularize_5m_epoch(df, tz_target, tz_target)
+        df.attrs["filled_bars"] = int(filled + n_filled)
+        return df
+    return ensure_regular_5m(df, tz_target, tz_target, engine=engine)
+
+def load_all(raw_glob: str, tz_source: str, tz_target: str, ensure_regular: bool=True,
+             workers: int=1, executor: str="process", arrow_parquet: bool=False, engine: str="join",
+             fill_seams: bool=False) -> pd.DataFrame:
+    """
+    workers > 1: อ่าน/ตรวจ/normalize หลายไฟล์พร้อมกันด้วย process หรือ thread pool
+    ผลลัพธ์ถูกรวมตามลำดับไฟล์ด้วย concat_regular จึงเหมือนโหมด sequential ทุกประการ
+    fill_seams=True: ลบ timestamp ซ้ำและเติมช่องว่างระหว่างไฟล์ด้วย (ดู concat_regular)
+    engine="epoch": ผลรวมจำนวนแท่งที่เติมอยู่ใน data.attrs["filled_bars"]
+    """
     files = sorted(glob.glob(raw_glob))
     if not files:
         raise FileNotFoundError(f"No files matched: {raw_glob}")
-    dfs = []
-    for f in files:
-        df = read_any(f)
-        need = {"timestamp","open","high","low","close","volume"}
-        miss = need - set(df.columns)
-        if miss:
-            raise ValueError(f"{f} missing columns: {miss}")
-        if ensure_regular:
-            df = ensure_regular_5m(df, tz_source, tz_target)
-        else:
-            ts = pd.to_datetime(df["timestamp"])
-            if ts.dt.tz is None:
-                ts = ts.dt.tz_localize(tz_source)
-            df = df.copy()
-            df["timestamp"] = ts.dt.tz_convert(tz_target)
-            df = df.sort_values("timestamp")
-        dfs.append(df)
-    data = pd.concat(dfs, ignore_index=True).sort_values("timestamp")
-    return data
+    dfs = load_files(files, tz_source, tz_target, ensure_regular, workers, executor, arrow_parquet, engine)
+    return concat_regular(dfs, tz_target, ensure_regular, engine, fill_seams)
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+PRICE_COLS = ["open","high","low","close"]
+
+def compact_bars(df: pd.DataFrame, price_dtype: str="float32", price_scale: int=100) -> pd.DataFrame:
+    """
+    แปลง prepared bars เป็น schema กะทัดรัด:
+    timestamp -> int64 epoch ns (UTC), ราคา -> float32 หรือ int64 (x price_scale), volume -> float32
+    """
+    out = pd.DataFrame(index=df.index)
+    out["timestamp"] = pd.DatetimeIndex(pd.to_datetime(df["timestamp"], utc=True)).as_unit("ns").asi8
+    for c in df.columns:
+        if c == "timestamp":
+            continue
+        v = df[c].to_numpy()
+        if c in PRICE_COLS and price_dtype == "int64":
+            out[c] = np.rint(v * price_scale).astype(np.int64)
+        elif c in PRICE_COLS or c == "volume":
+            out[c] = v.astype(np.float32)
+        else:
+            out[c] = v
+    return out
+
+def expand_bars(df: pd.DataFrame, price_scale: int=100, float_dtype: str="float64") -> pd.DataFrame:
+    """
+    กลับด้านของ compact_bars: timestamp -> datetime UTC, ราคาจำนวนเต็ม -> float
+    ค่าเริ่มต้น float64: float32 มีความละเอียดไม่ถึง 1 tick เมื่อราคา x price_scale เกิน 2^24
+    (เช่น > ~168k ที่ scale 100) และ to_prepared จะปัดราคาที่คลาดไปกลับลง store ตอน incremental merge
+    """
+    if df["timestamp"].dtype.kind in "iu":
+        df = df.copy()
+        df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ns", utc=True)
+    for c in PRICE_COLS:
+        if c in df and df[c].dtype.kind in "iu":
+            df[c] = (df[c].to_numpy() / price_scale).astype(float_dtype)
+    return df
+
+def to_prepared(df: pd.DataFrame, cfg_data: dict) -> pd.DataFrame:
+    """แปลงก่อนเขียน prepared store ตาม data.compact"""
+    if not cfg_data.get("compact", False):
+        return df
+    return compact_bars(df, cfg_data.get("price_dtype", "float32"), cfg_data.get("price_scale", 100))
+
+def from_prepared(df: pd.DataFrame, cfg_data: dict) -> pd.DataFrame:
+    """แปลงหลังอ่าน prepared store (ไม่มีผลกับไฟล์ schema เดิม)"""
+    return expand_bars(df, cfg_data.get("price_scale", 100))
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True, index=False).sum())
+
+def drift_report(ref: pd.DataFrame, cmp: pd.DataFrame, cols: list) -> pd.DataFrame:
+    """
+    เทียบคอลัมน์ที่ตรงกันของเส้นทาง float64 (ref) กับ compact (cmp) ตาม timestamp
+    คืนตาราง max_abs / max_abs_over_std / rmse ต่อคอลัมน์ (target = สัดส่วนป้ายที่ไม่ตรงกัน)
+    max_abs_over_std เทียบ error กับสเกลของคอลัมน์ (หลัง scaler จึงมีความหมายกับโมเดลโดยตรง)
+    """
+    a = ref.set_index("timestamp")
+    b = cmp.set_index("timestamp")
+    idx = a.index.intersection(b.index)
+    rows = []
+    for c in cols:
+        x = a.loc[idx, c].to_numpy(dtype=np.float64)
+        y = b.loc[idx, c].to_numpy(dtype=np.float64)
+        d = np.abs(x - y)
+        if c == "target":
+            rows.append({"column": c, "mismatch_rate": float((d > 0).mean()) if len(d) else 0.0})
+            continue
+        if not len(d):
+            rows.append({"column": c})
+            continue
+        rows.append({
+            "column": c,
+            "max_abs": float(d.max()),
+            "max_abs_over_std": float(d.max() / max(x.std(), 1e-12)),
+            "rmse": float(np.sqrt((d**2).mean())),
+        })
+    return pd.DataFrame(rows)
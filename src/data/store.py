@@ -0,0 +1,68 @@
+import shutil
+from pathlib import Path
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+PARTS_DIR = "data/prepared/btc_5m_parts"
+
+def write_partitioned(df: pd.DataFrame, root: str=PARTS_DIR, touched=None):
+    """
+    เขียน prepared bars แบ่งพาร์ทิชัน year=YYYY/month=M (ตามเวลา UTC)
+    touched=(t_min, t_max): เขียนทับเฉพาะเดือนที่ช่วงนี้ครอบคลุม (ใช้กับ incremental)
+    ไม่ระบุ = แทนที่ store เดิมทั้งหมด
+    """
+    ts = pd.to_datetime(df["timestamp"], utc=True)
+    ym = ts.dt.year.to_numpy() * 12 + ts.dt.month.to_numpy() - 1
+    if touched is not None:
+        lo, hi = (pd.Timestamp(t).tz_convert("UTC") for t in touched)
+        sel = (ym >= lo.year * 12 + lo.month - 1) & (ym <= hi.year * 12 + hi.month - 1)
+        df, ym = df[sel], ym[sel]
+    table = pa.Table.from_pandas(df.assign(year=ym // 12, month=ym % 12 + 1), preserve_index=False)
+    if touched is None and Path(root).exists():
+        shutil.rmtree(root)
+    ds.write_dataset(table, root, format="parquet", partitioning=["year", "month"],
+                     partitioning_flavor="hive", existing_data_behavior="delete_matching")
+
+def _dataset(root: str):
+    return ds.dataset(root, format="parquet", partitioning="hive")
+
+def read_timestamps(root: str=PARTS_DIR) -> pd.Series:
+    """อ่านเฉพาะคอลัมน์ timestamp (ใช้คำนวณขอบ walk-forward โดยไม่โหลดราคา)"""
+    tbl = _dataset(root).to_table(columns=["timestamp"])
+    return pd.to_datetime(tbl.column("timestamp").to_pandas(), utc=True).sort_values(ignore_index=True)
+
+def read_range(root: str, start, end, columns=None) -> pd.DataFrame:
+    """
+    โหลดแท่งในช่วง [start, end) โดย prune พาร์ทิชัน year/month ที่ไม่เกี่ยวข้อง
+    และ push ตัวกรอง timestamp ลงถึง row group
+    """
+    start, end = pd.Timestamp(start).tz_convert("UTC"), pd.Timestamp(end).tz_convert("UTC")
+    dset = _dataset(root)
+    y, m = ds.field("year"), ds.field("month")
+    last = end - pd.Timedelta(1, "ns")
+    part = (((y > start.year) | ((y == start.year) & (m >= start.month)))
+            & ((y < last.year) | ((y == last.year) & (m <= last.month))))
+    ts_type = dset.schema.field("timestamp").type
+    t = ds.field("timestamp")
+    if pa.types.is_integer(ts_type):
+        # compact schema: timestamp เป็น int64 epoch ns
+        lo, hi = pa.scalar(start.as_unit("ns").value), pa.scalar(end.as_unit("ns").value)
+    else:
+        lo, hi = pa.scalar(start.to_pydatetime(), type=ts_type), pa.scalar(end.to_pydatetime(), type=ts_type)
+    rows = (t >= lo) & (t < hi)
+    names = [c for c in dset.schema.names if c not in ("year", "month")]
+    cols = names if columns is None else [c for c in names if c in set(columns) | {"timestamp"}]
+    df = dset.to_table(columns=cols, filter=part & rows).to_pandas()
+    return df.sort_values("timestamp", ignore_index=True)
+
+def feature_warmup_bars(cfg: dict) -> int:
+    """
+    จำนวนแท่งย้อนหลังที่ต้องโหลดเพิ่มก่อน train window เพื่อให้ EMA/RSI/ATR ลู่เข้า
+    ค่าเริ่มต้น = warmup_factor x period ที่ยาวที่สุด (EMA มีหน่วยความจำไม่สิ้นสุด จึงเผื่อหลายเท่า)
+    """
+    if cfg["data"].get("warmup_bars"):
+        return int(cfg["data"]["warmup_bars"])
+    f = cfg["feature"]
+    longest = max(list(f["ema_periods"]) + [f["rsi_period"], f["atr_period"]])
+    return int(cfg["data"].get("warmup_factor", 5) * longest + max(f["return_lags"]) + 1)
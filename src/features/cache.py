@@ -0,0 +1,75 @@
+"""
+แคชฟีเจอร์/ป้ายบนดิสก์ (parquet หนึ่งไฟล์ต่อคอลัมน์)
+<cache_dir>/<data fingerprint>/
+    <col>-<spec hash>.parquet     คอลัมน์ฟีเจอร์ก่อน dropna (แถวตรงกับ prepared data)
+    target-<hash>.parquet         ป้ายหลัง dropna ฟีเจอร์
+เพิ่ม EMA period ใหม่ -> คำนวณเฉพาะคอลัมน์นั้น คอลัมน์อื่นอ่านจากแคช
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from .indicators import feature_columns, column_spec, compute_columns, assemble_features
+
+def _hash(obj) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """hash ของเนื้อหา prepared bars (ทุกคอลัมน์ + ลำดับแถว)"""
+    h = hashlib.sha256()
+    for c in df.columns:
+        h.update(c.encode())
+        v = df[c]
+        a = pd.DatetimeIndex(v).asi8 if v.dtype.kind == "M" else v.to_numpy()
+        h.update(np.ascontiguousarray(a).tobytes())
+    return h.hexdigest()[:16]
+
+def _write(path: Path, frame: pd.DataFrame):
+    tmp = path.with_suffix(".tmp")
+    frame.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+def cached_prepare(df: pd.DataFrame, cfg: dict, label_fn, cache_dir: str):
+    """
+    ผลเหมือน label_fn(add_features(df, cfg)) แต่อ่าน/เขียนแคช
+    label_fn รับเฟรมฟีเจอร์แล้วคืน Series ป้าย (index เดียวกัน)
+    คืน (เฟรม, info) โดย info["hit"] = คอลัมน์ทั้งหมดมาจากแคช
+    """
+    root = Path(cache_dir) / frame_fingerprint(df)
+    root.mkdir(parents=True, exist_ok=True)
+    names = feature_columns(cfg)
+    files = {c: root / f"{c}-{_hash(column_spec(c, cfg))}.parquet" for c in names}
+    # ป้ายขึ้นกับทุกคอลัมน์ (แถวที่ถูก dropna), config ของ label และ feature.dtype
+    # (assemble_features cast atr ก่อนติดป้าย first_touch จึงให้ป้ายต่างกันตาม dtype)
+    label_key = [column_spec(c, cfg) for c in names] + [cfg["label"], cfg["feature"].get("dtype", "float64")]
+    label_file = root / f"target-{_hash(label_key)}.parquet"
+
+    missing = [c for c in names if not files[c].exists()]
+    parts = {}
+    if missing:
+        computed = compute_columns(df, cfg, missing)
+        for c in missing:
+            _write(files[c], computed[[c]])
+            parts[c] = computed[c]
+    for c in names:
+        if c not in parts:
+            s = pd.read_parquet(files[c])[c]
+            if len(s) != len(df):
+                raise ValueError(f"Stale cache file: {files[c]}")
+            parts[c] = pd.Series(s.to_numpy(), index=df.index, name=c)
+    feats = assemble_features(df, pd.DataFrame(parts, index=df.index)[names], cfg)
+
+    label_hit = label_file.exists()
+    if label_hit:
+        target = pd.read_parquet(label_file)["target"].to_numpy()
+        if len(target) != len(feats):
+            raise ValueError(f"Stale cache file: {label_file}")
+        feats["target"] = target
+    else:
+        feats["target"] = label_fn(feats)
+        _write(label_file, feats[["target"]])
+
+    return feats, {"hit": not missing and label_hit, "computed": missing, "labels_cached": label_hit}
@@ -1,44 +1,122 @@
 import numpy as np
 import pandas as pd
-from ta.volatility import AverageTrueRange
-from ta.momentum import RSIIndicator
-from ta.trend import EMAIndicator
 
-def add_features(df: pd.DataFrame, cfg: dict) -> pd.DataFrame:
-    df = df.copy()
+from . import native
+
+def feature_columns(cfg: dict) -> list:
+    """ชื่อคอลัมน์ฟีเจอร์ตามลำดับที่ add_features สร้าง (ลำดับนี้คือลำดับ input ของโมเดล)"""
+    f = cfg["feature"]
+    return (["logret"] + [f"logret_lag_{h}" for h in f["return_lags"]]
+            + ["atr", "atr_norm"] + [f"ema_{p}_gap" for p in f["ema_periods"]]
+            + ["rsi", "body_norm", "hl_range", "tod_sin", "tod_cos", "dow_sin", "dow_cos"])
+
+def column_spec(name: str, cfg: dict) -> tuple:
+    """พารามิเตอร์ทั้งหมดที่กำหนดค่าของคอลัมน์หนึ่ง (ใช้เป็น key ของ feature cache)"""
+    f = cfg["feature"]
+    engine = f.get("engine", "ta")
+    if name in ("atr", "atr_norm"):
+        return (name, engine, f["atr_period"])
+    if name == "rsi":
+        return (name, engine, f["rsi_period"])
+    if name.startswith("ema_"):
+        return (name, engine)
+    if name.startswith("logret_lag_"):
+        # rolling sum กับ cumsum ต่างกันที่การปัดเศษ จึงแยก cache ตาม engine
+        return (name, engine)
+    return (name,)
+
+def _ta_ema(close, p):
+    from ta.trend import EMAIndicator
+    return EMAIndicator(close, window=p).ema_indicator()
+
+def _ta_atr(close, high, low, n):
+    from ta.volatility import AverageTrueRange
+    return AverageTrueRange(high, low, close, window=n).average_true_range()
+
+def _ta_rsi(close, n):
+    from ta.momentum import RSIIndicator
+    return RSIIndicator(close, window=n).rsi()
+
+def compute_columns(df: pd.DataFrame, cfg: dict, names=None) -> pd.DataFrame:
+    """
+    คำนวณเฉพาะคอลัมน์ฟีเจอร์ที่ขอ (ยังไม่ dropna, เรียงแถวตาม df)
+    feature.engine: "ta" (เดิม) หรือ "native" (src.features.native; ไม่ต้องใช้ ta, lag ทั้งหมดจาก cumsum เดียว)
+    """
+    f = cfg["feature"]
+    engine = f.get("engine", "ta")
+    if engine not in ("ta", "native"):
+        raise ValueError(f"Unknown feature engine: {engine}")
+    names = feature_columns(cfg) if names is None else list(names)
+    want = set(names)
+    out = {}
+    # ราคาแบบ compact (float32) ถูกยกเป็น float64 เฉพาะตอนคำนวณ
+    close, high, low, open_ = (df[c].astype("float64") for c in ["close","high","low","open"])
+    def wrap(v):
+        return pd.Series(v, index=df.index)
 
     # log returns
-    df["logret"] = np.log(df["close"]).diff()
-    for h in cfg["feature"]["return_lags"]:
-        df[f"logret_lag_{h}"] = df["logret"].shift(1).rolling(h).sum()
+    lags = [h for h in f["return_lags"] if f"logret_lag_{h}" in want]
+    if "logret" in want or lags:
+        logret = np.log(close).diff()
+        out["logret"] = logret
+        if engine == "native":
+            sums = native.lagged_sums(logret.to_numpy(), lags)
+            for h in lags:
+                out[f"logret_lag_{h}"] = wrap(sums[h])
+        else:
+            for h in lags:
+                out[f"logret_lag_{h}"] = logret.shift(1).rolling(h).sum()
 
     # ATR & normalized
-    atr = AverageTrueRange(df["high"], df["low"], df["close"], window=cfg["feature"]["atr_period"])
-    df["atr"] = atr.average_true_range()
-    df["atr_norm"] = df["atr"] / df["close"]
+    if want & {"atr", "atr_norm"}:
+        if engine == "native":
+            atr = wrap(native.atr(high.to_numpy(), low.to_numpy(), close.to_numpy(), f["atr_period"]))
+        else:
+            atr = _ta_atr(close, high, low, f["atr_period"])
+        out["atr"] = atr
+        out["atr_norm"] = atr / close
 
     # EMA gaps
-    for p in cfg["feature"]["ema_periods"]:
-        ema = EMAIndicator(df["close"], window=p).ema_indicator()
-        df[f"ema_{p}_gap"] = (df["close"] - ema) / df["close"]
+    for p in f["ema_periods"]:
+        if f"ema_{p}_gap" not in want:
+            continue
+        ema = wrap(native.ema(close.to_numpy(), p)) if engine == "native" else _ta_ema(close, p)
+        out[f"ema_{p}_gap"] = (close - ema) / close
 
     # RSI (0..1)
-    rsi = RSIIndicator(df["close"], window=cfg["feature"]["rsi_period"]).rsi()
-    df["rsi"] = (rsi/100.0).clip(0,1)
+    if "rsi" in want:
+        rsi = wrap(native.rsi(close.to_numpy(), f["rsi_period"])) if engine == "native" else _ta_rsi(close, f["rsi_period"])
+        out["rsi"] = (rsi/100.0).clip(0,1)
 
     # Candle/body & range
-    body = (df["close"] - df["open"])
-    rng = (df["high"] - df["low"]).replace(0, np.nan)
-    df["body_norm"] = (body / rng).clip(-5,5).fillna(0)
-    df["hl_range"] = rng / df["close"]
+    if want & {"body_norm", "hl_range"}:
+        body = (close - open_)
+        rng = (high - low).replace(0, np.nan)
+        out["body_norm"] = (body / rng).clip(-5,5).fillna(0)
+        out["hl_range"] = rng / close
 
     # Time features
-    ts = pd.to_datetime(df["timestamp"], utc=True)
-    minute = ts.dt.minute + ts.dt.hour * 60
-    df["tod_sin"] = np.sin(2*np.pi*minute/1440)
-    df["tod_cos"] = np.cos(2*np.pi*minute/1440)
-    dow = ts.dt.dayofweek
-    df["dow_sin"] = np.sin(2*np.pi*dow/7)
-    df["dow_cos"] = np.cos(2*np.pi*dow/7)
-
-    return df.dropna()
+    if want & {"tod_sin", "tod_cos", "dow_sin", "dow_cos"}:
+        ts = pd.to_datetime(df["timestamp"], utc=True)
+        minute = ts.dt.minute + ts.dt.hour * 60
+        out["tod_sin"] = np.sin(2*np.pi*minute/1440)
+        out["tod_cos"] = np.cos(2*np.pi*minute/1440)
+        dow = ts.dt.dayofweek
+        out["dow_sin"] = np.sin(2*np.pi*dow/7)
+        out["dow_cos"] = np.cos(2*np.pi*dow/7)
+
+    return pd.DataFrame({c: out[c] for c in names}, index=df.index)
+
+def assemble_features(df: pd.DataFrame, cols: pd.DataFrame, cfg: dict) -> pd.DataFrame:
+    """
+    ต่อคอลัมน์ฟีเจอร์เข้ากับ bars แล้ว dropna
+    feature.dtype: "float32" = คำนวณด้วย float64 แล้วเก็บคอลัมน์ฟีเจอร์เป็น float32
+    """
+    df = pd.concat([df, cols], axis=1).dropna()
+    dtype = cfg["feature"].get("dtype", "float64")
+    if dtype != "float64":
+        df[list(cols.columns)] = df[list(cols.columns)].astype(dtype)
+    return df
+
+def add_features(df: pd.DataFrame, cfg: dict) -> pd.DataFrame:
+    return assemble_features(df, compute_columns(df, cfg), cfg)
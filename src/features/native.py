@@ -0,0 +1,93 @@
+"""
+อินดิเคเตอร์แบบ array ล้วน (ไม่พึ่ง ta/pandas) ให้ผลตรงกับ ta ภายใน |Δ| <= 1e-9 x สเกลของค่า
+(ต่างกันเฉพาะลำดับการปัดเศษของ recursion; ที่วัดได้จริงอยู่ราว 1e-14)
+ค่า NaN ช่วง warm-up ตรงกับ ta: EMA/RSI เป็น NaN ก่อนครบ period, ATR เป็น 0 ก่อนครบ period
+"""
+import numpy as np
+
+def linear_recurrence(u: np.ndarray, b: float) -> np.ndarray:
+    """
+    y[t] = b * y[t-1] + u[t] (y[-1] = 0) ด้วย log-step scan: pass ที่ k บวกผลของ 2^k แท่งก่อนหน้า
+    จำนวน pass ~ log2(จำนวนแท่งที่ b^s ยังไม่เป็น 0) จึงเป็น vectorized ทั้งหมด
+    """
+    y = np.array(u, dtype=np.float64)
+    n = len(y)
+    s, f = 1, float(b)
+    while s < n and f != 0.0:
+        y[s:] += f * y[:-s]
+        s *= 2
+        f *= f
+    return y
+
+def ema(x: np.ndarray, period: int) -> np.ndarray:
+    """เหมือน Series.ewm(span=period, adjust=False, min_periods=period).mean()"""
+    x = np.asarray(x, dtype=np.float64)
+    a = 2.0 / (period + 1)
+    y = linear_recurrence(ewm_input(x, a), 1.0 - a)
+    y[:period - 1] = np.nan
+    return y
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    prev = np.empty_like(close)
+    prev[0] = np.nan
+    prev[1:] = close[:-1]
+    tr = high - low
+    with np.errstate(invalid="ignore"):
+        np.fmax(tr, np.abs(high - prev), out=tr)
+        np.fmax(tr, np.abs(low - prev), out=tr)
+    return tr
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int) -> np.ndarray:
+    """Wilder ATR แบบ ta.volatility.AverageTrueRange (ค่าก่อนครบ period เป็น 0)"""
+    high, low, close = (np.asarray(v, dtype=np.float64) for v in (high, low, close))
+    tr = true_range(high, low, close)
+    out = np.zeros(len(close))
+    if len(close) < period:
+        return out
+    u = tr[period - 1:] / period
+    u[0] = tr[:period].mean()
+    out[period - 1:] = linear_recurrence(u, (period - 1) / period)
+    return out
+
+def rsi(close: np.ndarray, period: int) -> np.ndarray:
+    """RSI แบบ ta.momentum.RSIIndicator (0..100, Wilder smoothing alpha=1/period)"""
+    close = np.asarray(close, dtype=np.float64)
+    diff = np.empty_like(close)
+    diff[:1] = 0.0
+    diff[1:] = np.diff(close)
+    up = np.where(diff > 0, diff, 0.0)
+    dn = np.where(diff < 0, -diff, 0.0)
+    a = 1.0 / period
+    up_s = linear_recurrence(ewm_input(up, a), 1.0 - a)
+    dn_s = linear_recurrence(ewm_input(dn, a), 1.0 - a)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = np.where(dn_s == 0, 100.0, 100.0 - 100.0 / (1.0 + up_s / dn_s))
+    out[:period - 1] = np.nan
+    return out
+
+def ewm_input(x: np.ndarray, a: float) -> np.ndarray:
+    """u ของ ewm(adjust=False): y[0] = x[0], y[t] = (1-a) y[t-1] + a x[t]"""
+    u = a * x
+    if len(u):
+        u[0] = x[0]
+    return u
+
+def lagged_sums(r: np.ndarray, lags) -> dict:
+    """
+    sum(r[t-h .. t-1]) ของทุก h จาก cumulative sum เดียว
+    (เท่ากับ Series(r).shift(1).rolling(h).sum(); NaN เมื่อหน้าต่างยังมี NaN)
+    """
+    r = np.asarray(r, dtype=np.float64)
+    bad = np.isnan(r)
+    c = np.concatenate(([0.0], np.cumsum(np.where(bad, 0.0, r))))
+    nb = np.concatenate(([0], np.cumsum(bad)))
+    n = len(r)
+    out = {}
+    for h in lags:
+        v = np.full(n, np.nan)
+        if n > h:
+            # แถว t ใช้ r[t-h : t] -> c[t] - c[t-h]
+            v[h:] = c[h:n] - c[:n - h]
+            v[h:][(nb[h:n] - nb[:n - h]) > 0] = np.nan
+        out[h] = v
+    return out
@@ -0,0 +1,175 @@
+"""
+ฟีเจอร์แบบ streaming สำหรับ live inference: อัปเดตทีละแท่งด้วย state คงที่ (O(1) ต่อแท่ง)
+ให้คอลัมน์เดียวกับ add_features (ลำดับตาม feature_columns) และค่าตรงกับ engine "native"
+ภายในความคลาดเคลื่อนของการปัดเศษ; ช่วง warm-up คืน NaN เหมือนก่อน dropna
+"""
+import math
+from collections import deque
+import numpy as np
+import pandas as pd
+
+from . import native
+from .indicators import feature_columns
+
+_RESYNC = 4096  # รวมผล lag ใหม่จาก buffer ทุก ๆ N แท่ง กัน drift ของ running sum
+
+class StreamingFeatures:
+    def __init__(self, cfg: dict):
+        f = cfg["feature"]
+        self.columns = feature_columns(cfg)
+        self.lags = list(f["return_lags"])
+        self.ema_periods = list(f["ema_periods"])
+        self.atr_period = int(f["atr_period"])
+        self.rsi_period = int(f["rsi_period"])
+        self.max_lag = max(self.lags) if self.lags else 0
+        self.n = 0                     # จำนวนแท่งที่ผ่านมา
+        self.prev_close = None
+        self.rets = deque(maxlen=self.max_lag)   # logret ล่าสุด (ไม่รวมแท่งปัจจุบัน)
+        self.lag_sums = {h: 0.0 for h in self.lags}
+        self.ema = {p: None for p in self.ema_periods}
+        self.atr = 0.0
+        self.tr_sum = 0.0              # ผลรวม TR ช่วง seed ของ ATR
+        self.up = None
+        self.dn = None
+
+    # ---------- snapshot / restore ----------
+    def snapshot(self) -> dict:
+        """state ทั้งหมดเป็น dict ธรรมดา (JSON ได้) สำหรับบันทึก/ย้าย process"""
+        return {
+            "n": self.n, "prev_close": self.prev_close, "rets": list(self.rets),
+            "lag_sums": {str(h): v for h, v in self.lag_sums.items()},
+            "ema": {str(p): v for p, v in self.ema.items()},
+            "atr": self.atr, "tr_sum": self.tr_sum, "up": self.up, "dn": self.dn,
+        }
+
+    def restore(self, state: dict):
+        self.n = int(state["n"])
+        self.prev_close = state["prev_close"]
+        self.rets = deque(state["rets"], maxlen=self.max_lag)
+        self.lag_sums = {h: float(state["lag_sums"][str(h)]) for h in self.lags}
+        self.ema = {p: state["ema"][str(p)] for p in self.ema_periods}
+        self.atr, self.tr_sum = float(state["atr"]), float(state["tr_sum"])
+        self.up, self.dn = state["up"], state["dn"]
+        return self
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, cfg: dict):
+        """
+        warm-start จาก prepared bars (เช่น parquet ย้อนหลัง) ด้วยการคำนวณแบบ vectorized ครั้งเดียว
+        แล้วเก็บเฉพาะ state ท้ายสุด -> แท่งถัดไปต่อด้วย update() ได้ทันที
+        """
+        self = cls(cfg)
+        n = len(df)
+        if n == 0:
+            return self
+        close = df["close"].to_numpy(dtype=np.float64)
+        high = df["high"].to_numpy(dtype=np.float64)
+        low = df["low"].to_numpy(dtype=np.float64)
+        r = np.diff(np.log(close))
+        self.n = n
+        self.prev_close = float(close[-1])
+        self.rets = deque(r[-self.max_lag:].tolist() if self.max_lag else [], maxlen=self.max_lag)
+        self._resync()
+        for p in self.ema_periods:
+            a = 2.0 / (p + 1)
+            self.ema[p] = float(native.linear_recurrence(native.ewm_input(close, a), 1 - a)[-1])
+        if n >= self.atr_period:
+            self.atr = float(native.atr(high, low, close, self.atr_period)[-1])
+        else:
+            self.tr_sum = float(native.true_range(high, low, close).sum())
+        diff = np.concatenate(([0.0], np.diff(close)))
+        a = 1.0 / self.rsi_period
+        self.up = float(native.linear_recurrence(native.ewm_input(np.where(diff > 0, diff, 0.0), a), 1 - a)[-1])
+        self.dn = float(native.linear_recurrence(native.ewm_input(np.where(diff < 0, -diff, 0.0), a), 1 - a)[-1])
+        return self
+
+    @classmethod
+    def from_parquet(cls, cfg: dict, path: str="data/prepared/btc_5m_clean.parquet"):
+        """warm-start จาก prepared parquet (รองรับ compact schema)"""
+        from ..data.schema import from_prepared
+        df = from_prepared(pd.read_parquet(path), cfg["data"]).sort_values("timestamp")
+        return cls.from_frame(df, cfg)
+
+    # ---------- update ----------
+    def _resync(self):
+        buf = list(self.rets)
+        for h in self.lags:
+            self.lag_sums[h] = math.fsum(buf[-h:])
+
+    def update(self, ts, open_: float, high: float, low: float, close: float) -> np.ndarray:
+        """รับแท่งใหม่ 1 แท่ง คืน array ฟีเจอร์ตามลำดับ self.columns"""
+        out = {}
+        i = self.n
+        prev = self.prev_close
+
+        # log returns: lag h ของแท่ง i = sum(logret[i-h .. i-1])
+        nret = len(self.rets)
+        for h in self.lags:
+            out[f"logret_lag_{h}"] = self.lag_sums[h] if nret >= h else math.nan
+        ret = math.log(close / prev) if prev is not None else math.nan
+        out["logret"] = ret
+        if prev is not None and self.max_lag:
+            # หน้าต่าง lag h เลื่อน: บวก ret ใหม่ ลบค่าที่หลุดจาก h ตัวล่าสุด
+            buf = self.rets
+            for h in self.lags:
+                self.lag_sums[h] += ret - (buf[-h] if nret >= h else 0.0)
+            buf.append(ret)
+            if i % _RESYNC == 0:
+                self._resync()
+
+        # ATR (Wilder, ค่าก่อนครบ period = 0)
+        tr = high - low
+        if prev is not None:
+            tr = max(tr, abs(high - prev), abs(low - prev))
+        n_atr = self.atr_period
+        if i < n_atr - 1:
+            self.tr_sum += tr
+        elif i == n_atr - 1:
+            self.atr = (self.tr_sum + tr) / n_atr
+        else:
+            self.atr = (self.atr * (n_atr - 1) + tr) / n_atr
+        out["atr"] = self.atr
+        out["atr_norm"] = self.atr / close
+
+        # EMA gaps
+        for p in self.ema_periods:
+            a = 2.0 / (p + 1)
+            e = close if self.ema[p] is None else (1 - a) * self.ema[p] + a * close
+            self.ema[p] = e
+            out[f"ema_{p}_gap"] = (close - e) / close if i >= p - 1 else math.nan
+
+        # RSI (0..1)
+        d = close - prev if prev is not None else 0.0
+        a = 1.0 / self.rsi_period
+        u, v = (d if d > 0 else 0.0), (-d if d < 0 else 0.0)
+        self.up = u if self.up is None else (1 - a) * self.up + a * u
+        self.dn = v if self.dn is None else (1 - a) * self.dn + a * v
+        if i < self.rsi_period - 1:
+            out["rsi"] = math.nan
+        else:
+            rsi = 100.0 if self.dn == 0 else 100.0 - 100.0 / (1.0 + self.up / self.dn)
+            out["rsi"] = min(max(rsi / 100.0, 0.0), 1.0)
+
+        # Candle/body & range
+        rng = high - low
+        out["body_norm"] = min(max((close - open_) / rng, -5.0), 5.0) if rng != 0 else 0.0
+        out["hl_range"] = rng / close if rng != 0 else math.nan
+
+        # Time features (UTC; 1970-01-01 เป็นวันพฤหัส -> dayofweek 3)
+        sec = _epoch_seconds(ts)
+        minute = (sec // 60) % 1440
+        dow = (sec // 86400 + 3) % 7
+        out["tod_sin"] = math.sin(2*math.pi*minute/1440)
+        out["tod_cos"] = math.cos(2*math.pi*minute/1440)
+        out["dow_sin"] = math.sin(2*math.pi*dow/7)
+        out["dow_cos"] = math.cos(2*math.pi*dow/7)
+
+        self.prev_close = close
+        self.n += 1
+        return np.array([out[c] for c in self.columns])
+
+def _epoch_seconds(ts) -> int:
+    """รับ int (epoch ns), datetime หรือ Timestamp (ไม่มี tz = UTC)"""
+    if isinstance(ts, (int, np.integer)):
+        return int(ts) // 10**9
+    return pd.Timestamp(ts).value // 10**9
@@ -1,23 +1,160 @@
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 
-def make_triple_barrier_labels(df: pd.DataFrame, atr_mult_tp: float, atr_mult_sl: float, max_holding: int, min_move_bps: int=0) -> pd.Series:
+CHUNK_CELLS = 1 << 22  # จำนวนช่อง (แท่ง x horizon) ต่อ chunk ของ kernel
+
+def make_triple_barrier_labels(df: pd.DataFrame, atr_mult_tp: float, atr_mult_sl: float, max_holding: int, min_move_bps: int=0,
+                               method: str="proxy") -> pd.Series:
     """
     ให้ป้ายกำกับ 3 ชั้น: -1 (short), 0 (flat), +1 (long)
-    แบบกระชับ: ใช้ผลตอบแทนล่วงหน้าในกรอบ max_holding เป็น proxy (ลดคอมพิวต์),
+    method="proxy": แบบกระชับ ใช้ผลตอบแทนล่วงหน้าในกรอบ max_holding เป็น proxy (ลดคอมพิวต์),
     โดยตั้งเกณฑ์ minimum move (bps) เพื่อกันสัญญาณจิ๋ว
+    method="first_touch": triple-barrier จริง ดู first_touch_labels
     """
+    if method == "first_touch":
+        return first_touch_labels(df, atr_mult_tp, atr_mult_sl, max_holding, min_move_bps)["target"]
+    if method != "proxy":
+        raise ValueError(f"Unknown label method: {method}")
     close = df["close"].to_numpy()
     n = len(df)
     tgt = np.zeros(n, dtype=np.int8)
     min_move = (min_move_bps/1e4) * close
 
-    for i in range(n - max_holding - 1):
-        c0 = close[i]
-        fwd = close[i+max_holding] - c0
-        if abs(fwd) < min_move[i]:
-            tgt[i] = 0
-        else:
-            tgt[i] = 1 if fwd > 0 else -1
+    m = max(n - max_holding - 1, 0)
+    fwd = close[max_holding:max_holding + m] - close[:m]
+    tgt[:m] = np.where(np.abs(fwd) < min_move[:m], 0, np.where(fwd > 0, 1, -1))
 
     return pd.Series(tgt, index=df.index, name="target")
+
+def _first_true(hit: np.ndarray) -> np.ndarray:
+    """index แรกที่เป็น True ในแต่ละแถว; ไม่มี = ความยาวแถว"""
+    first = hit.argmax(axis=1)
+    first[~hit[np.arange(len(hit)), first]] = hit.shape[1]
+    return first
+
+def first_touch_labels(df: pd.DataFrame, atr_mult_tp: float, atr_mult_sl: float, max_holding: int,
+                       min_move_bps: int=0, chunk_cells: int=CHUNK_CELLS) -> pd.DataFrame:
+    """
+    Triple-barrier แบบ first-touch ด้วย high/low:
+    บน = close + atr_mult_tp*atr, ล่าง = close - atr_mult_sl*atr ตรวจในแท่ง i+1 .. i+max_holding
+    แตะบนก่อน = +1, แตะล่างก่อน = -1, แตะทั้งคู่ในแท่งเดียวกัน = 0 (ไม่รู้ลำดับภายในแท่ง)
+    ไม่แตะจนครบ max_holding = vertical barrier: sign(ผลตอบแทน) ถ้า |ผลตอบแทน| >= min_move_bps มิฉะนั้น 0
+    แท่งท้ายที่ horizon ไม่พอและยังไม่แตะ = 0, touch_idx = -1
+    คืน DataFrame: target (int8), touch_idx (ตำแหน่งแท่งที่แตะ), touch_time
+    kernel ทำงานทีละ chunk บน sliding-window view (ไม่ copy ราคา) จึงรองรับหลายล้านแท่ง
+    """
+    if "atr" not in df:
+        raise ValueError("first_touch labels need an 'atr' column (run add_features first)")
+    close, high, low, atr = _arrays(df)
+    H = int(max_holding)
+    up_first, dn_first = first_touch_tables(high, low, [close + atr_mult_tp * atr], [close - atr_mult_sl * atr],
+                                            H, chunk_cells)
+    tgt, touch_idx = _resolve(close, up_first[0], dn_first[0], H, min_move_bps)
+
+    out = pd.DataFrame({"target": tgt, "touch_idx": touch_idx}, index=df.index)
+    if "timestamp" in df:
+        tt = df["timestamp"].iloc[np.maximum(touch_idx, 0)].reset_index(drop=True)
+        tt.index = df.index
+        out["touch_time"] = tt.where(touch_idx >= 0)
+    return out
+
+def _arrays(df: pd.DataFrame):
+    return tuple(df[c].to_numpy(dtype=np.float64) for c in ["close","high","low","atr"])
+
+def first_touch_tables(high: np.ndarray, low: np.ndarray, uppers: list, lowers: list, H: int,
+                       chunk_cells: int=CHUNK_CELLS):
+    """
+    ตาราง first-touch ของหลายระดับ barrier ในรอบเดียว: อ่านหน้าต่าง high/low ของแต่ละ chunk ครั้งเดียว
+    แล้วเทียบกับทุก barrier; คืน (up_first[k], dn_first[k]) = offset แรก (0..H-1) ที่แตะ, H = ไม่แตะ
+    """
+    n = len(high)
+    if H <= 0:
+        # horizon ว่าง: ไม่มีแท่งให้แตะ (เหมือน first_exits)
+        return [np.full(n, H, dtype=np.int64) for _ in uppers], [np.full(n, H, dtype=np.int64) for _ in lowers]
+    # pad ท้ายด้วย NaN (เทียบแล้วเป็น False) ให้ทุกแท่งมีหน้าต่างยาว H
+    pad = np.full(H, np.nan)
+    hw = sliding_window_view(np.concatenate((high[1:], pad)), H)[:n]
+    lw = sliding_window_view(np.concatenate((low[1:], pad)), H)[:n]
+
+    up_first = [np.empty(n, dtype=np.int64) for _ in uppers]
+    dn_first = [np.empty(n, dtype=np.int64) for _ in lowers]
+    step = max(1, chunk_cells // H)
+    for a in range(0, n, step):
+        b = min(a + step, n)
+        h, l = hw[a:b], lw[a:b]
+        for out, up in zip(up_first, uppers):
+            out[a:b] = _first_true(h >= up[a:b, None])
+        for out, dn in zip(dn_first, lowers):
+            out[a:b] = _first_true(l <= dn[a:b, None])
+    return up_first, dn_first
+
+def _resolve(close: np.ndarray, up_first: np.ndarray, dn_first: np.ndarray, H: int, min_move_bps: float):
+    """รวมตาราง first-touch เป็น (target, touch_idx) สำหรับ horizon H (<= horizon ของตาราง)"""
+    n = len(close)
+    idx = np.arange(n)
+    first = np.minimum(up_first, dn_first)
+    touched = first < H
+    tgt = np.zeros(n, dtype=np.int8)
+    tgt[touched & (up_first < dn_first)] = 1
+    tgt[touched & (dn_first < up_first)] = -1
+    touch_idx = np.where(touched, idx + 1 + first, -1)
+
+    # vertical barrier
+    vert = ~touched & (idx + H <= n - 1)
+    j = idx[vert] + H
+    fwd = close[j] - close[vert]
+    min_move = (min_move_bps/1e4) * close[vert]
+    tgt[vert] = np.where(np.abs(fwd) < min_move, 0, np.sign(fwd)).astype(np.int8)
+    touch_idx[vert] = j
+    return tgt, touch_idx
+
+def label_grid(df: pd.DataFrame, grid: dict, method: str="first_touch", chunk_cells: int=CHUNK_CELLS):
+    """
+    ป้ายของทุกชุดพารามิเตอร์ใน grid (atr_mult_tp x atr_mult_sl x max_holding x min_move_bps) ในรอบเดียว
+    ตาราง first-touch คำนวณครั้งเดียวต่อค่า tp/sl ที่ horizon ยาวสุด แล้วใช้ร่วมกันทุก max_holding/min_move
+    (first-touch ภายใน H ที่สั้นกว่า = offset < H ของตารางเดียวกัน)
+    คืน (labels int8 [n, K], combos DataFrame K แถว พร้อมสถิติสัดส่วนคลาส)
+    """
+    tps = list(grid.get("atr_mult_tp", [0.0]))
+    sls = list(grid.get("atr_mult_sl", [0.0]))
+    hs = [int(h) for h in grid["max_holding"]]
+    bps = list(grid.get("min_move_bps", [0]))
+    close = df["close"].to_numpy(dtype=np.float64)
+    n = len(close)
+
+    combos = []
+    if method == "proxy":
+        # proxy ไม่ขึ้นกับ tp/sl
+        for h in hs:
+            for b in bps:
+                combos.append({"max_holding": h, "min_move_bps": b})
+        labels = np.empty((n, len(combos)), dtype=np.int8)
+        for k, c in enumerate(combos):
+            labels[:, k] = make_triple_barrier_labels(df, 0, 0, c["max_holding"], c["min_move_bps"]).to_numpy()
+    elif method == "first_touch":
+        close, high, low, atr = _arrays(df)
+        H = max(hs)
+        up_first, dn_first = first_touch_tables(high, low, [close + m * atr for m in tps],
+                                                [close - m * atr for m in sls], H, chunk_cells)
+        for i, tp in enumerate(tps):
+            for j, sl in enumerate(sls):
+                for h in hs:
+                    for b in bps:
+                        combos.append({"atr_mult_tp": tp, "atr_mult_sl": sl, "max_holding": h, "min_move_bps": b,
+                                       "_ij": (i, j)})
+        labels = np.empty((n, len(combos)), dtype=np.int8)
+        for k, c in enumerate(combos):
+            i, j = c.pop("_ij")
+            labels[:, k] = _resolve(close, up_first[i], dn_first[j], c["max_holding"], c["min_move_bps"])[0]
+    else:
+        raise ValueError(f"Unknown label method: {method}")
+
+    stats = pd.DataFrame(combos)
+    cnt = np.stack([(labels == v).sum(axis=0) for v in (-1, 0, 1)], axis=1) / max(n, 1)
+    stats["frac_short"], stats["frac_flat"], stats["frac_long"] = cnt[:, 0], cnt[:, 1], cnt[:, 2]
+    stats["min_class_frac"] = cnt.min(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ent = -np.nansum(np.where(cnt > 0, cnt * np.log(cnt), 0.0), axis=1) / np.log(3)
+    stats["entropy"] = ent
+    return labels, stats
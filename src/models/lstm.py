@@ -10,3 +10,7 @@ class LSTMClf(nn.Module):
         out, _ = self.lstm(x)   # [B,T,F] -> [B,T,H]
         h = out[:, -1, :]       # last step
         return self.head(h)     # [B,C]
+    def forward_seq(self, x, state=None):
+        """logits ทุก timestep [B,T,C] + state (h, c) สำหรับต่อ chunk ถัดไป (stateful / truncated BPTT)"""
+        out, state = self.lstm(x, state)
+        return self.head(out), state
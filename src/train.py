@@ -1,71 +1,224 @@
-import yaml, json
+import yaml, json, os, shutil, tempfile, time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 import numpy as np
 import pandas as pd
 from tqdm import tqdm
 import torch
-from torch.utils.data import DataLoader
 import torch.nn as nn
 import torch.optim as optim
 
 from .features.indicators import add_features
+from .features.cache import cached_prepare
 from .labeling.triple_barrier import make_triple_barrier_labels
-from .utils.dataset import RollingStandardScaler, SeqDataset
-from .utils.splits import time_splits
+from .utils.dataset import (RollingStandardScaler, StreamingScaler, SeqDataset, StridedSeqDataset, MemmapSeqDataset,
+                            ValidationSet, write_memmap, make_loader)
+from .utils.accel import apply_threads, autocast, prepare_model
+from .utils.checkpoint import config_hash, save_checkpoint, load_checkpoint
+from .utils.profiler import StageTimer, make_timer, peak_rss_mb
+from .utils.splits import time_splits, window_bounds, window_indices
+from .data.schema import from_prepared
+from .data.incremental import load_manifest, save_manifest
+from .data.store import PARTS_DIR, read_timestamps, read_range, feature_warmup_bars
 from .models.lstm import LSTMClf
-from .backtest import run_backtest
+from .backtest import run_backtest, BACKTEST_KEYS
 
 def softmax_np(logits: np.ndarray) -> np.ndarray:
     m = logits.max(axis=1, keepdims=True)
     ex = np.exp(logits - m)
     return ex / ex.sum(axis=1, keepdims=True)
 
-def train_one_window(cfg: dict, df: pd.DataFrame, feat_cols: list, tr_idx, va_idx, te_idx):
+def train_one_window(cfg: dict, df: pd.DataFrame, feat_cols: list, tr_idx, va_idx, te_idx,
+                     init_state: dict=None, scaler=None, ckpt: tuple=None, timer: StageTimer=None):
+    """
+    เทรนหนึ่ง window คืน (model, scaler, proba ของ test, info)
+    init_state: state_dict เริ่มต้น (warm start) แทน random init; scaler: ใช้สถิติเดิมแทนการ fit ใหม่
+    ckpt: (path, key) บันทึก checkpoint ทุกท้าย epoch และเริ่มต่อจากไฟล์ที่ key ตรงกัน
+    timer: StageTimer ของ window (profile.*) จับเวลา scaler/dataset/setup/data/forward/backward/optimizer/
+           validation/checkpoint/test และเก็บ torch.profiler trace เมื่อ timer.trace_path ถูกตั้ง
+    info: epochs_run, epochs_to_best, best_step, best_val_acc, best_val_loss, train_seconds,
+          samples_per_s (เฉพาะ train step), mode
+    """
+    t_start = time.perf_counter()
     device = torch.device(cfg["train"]["device"] if (cfg["train"]["device"]=="cuda" and torch.cuda.is_available()) else "cpu")
+    timer = StageTimer(False) if timer is None else timer
+    timer.sync = timer.enabled and device.type == "cuda"
     seq_len = cfg["train"]["seq_len"]
 
     X = df[feat_cols].to_numpy()
     y = df["target"].to_numpy()
 
-    scaler = RollingStandardScaler().fit(X[tr_idx])
-    Xtr, Xva, Xte = scaler.transform(X[tr_idx]), scaler.transform(X[va_idx]), scaler.transform(X[te_idx])
-    ds_tr = SeqDataset(Xtr, y[tr_idx], seq_len)
-    ds_va = SeqDataset(Xva, y[va_idx], seq_len)
-    ds_te = SeqDataset(Xte, y[te_idx], seq_len)
+    # train.scaler: "standard" (เดิม), "streaming" (fit ทีละ chunk, X เป็น float32),
+    # "rolling" (normalize แบบ causal ด้วย train.scaler_window แท่งล่าสุด; สถิติ train เก็บไว้เป็น artifact)
+    mode = cfg["train"].get("scaler", "standard")
+    if mode not in ("standard", "streaming", "rolling"):
+        raise ValueError(f"Unknown scaler: {mode}")
+    with timer.stage("scaler"):
+        if scaler is None:
+            if mode == "standard":
+                scaler = RollingStandardScaler().fit(X[tr_idx])
+            else:
+                scaler = StreamingScaler(window=cfg["train"].get("scaler_window", 2016) if mode == "rolling" else None)
+                scaler.fit(X, rows=tr_idx)
+        transform = scaler.transform
+        if mode == "rolling":
+            # ต้องการแค่ window แถวก่อน train ก็ได้หน้าต่างเต็ม
+            lo, hi = max(0, int(tr_idx[0]) - scaler.window), int(te_idx[-1]) + 1
+            X, y = scaler.rolling_transform(X[lo:hi]), y[lo:hi]
+            tr_idx, va_idx, te_idx = tr_idx - lo, va_idx - lo, te_idx - lo
+            transform = lambda A: A
 
-    dl_tr = DataLoader(ds_tr, batch_size=cfg["train"]["batch_size"], shuffle=True, num_workers=0)
-    dl_va = DataLoader(ds_va, batch_size=4096, shuffle=False, num_workers=0)
-    dl_te = DataLoader(ds_te, batch_size=4096, shuffle=False, num_workers=0)
+    # train.mode: "window" = sliding window (เดิม), "tbptt" = รัน LSTM ต่อเนื่องบน series ของ window
+    # (ดู tbptt_epoch / stateful_logits) จึงไม่ใช้ dataset/DataLoader
+    tbptt = cfg["train"].get("mode", "window") == "tbptt"
+    if cfg["train"].get("mode", "window") not in ("window", "tbptt"):
+        raise ValueError(f"Unknown train mode: {cfg['train']['mode']}")
 
-    model = LSTMClf(in_ch=len(feat_cols), hidden=64, layers=2, num_classes=3).to(device)
-    class_w = torch.tensor(cfg["train"]["class_weights"], dtype=torch.float32, device=device)
-    crit = nn.CrossEntropyLoss(weight=class_w)
-    opt = optim.Adam(model.parameters(), lr=cfg["train"]["lr"])
+    # train.dataset: "strided" = float32 view + ดึงทีละ batch, "legacy" = SeqDataset เดิม (ทีละ sample)
+    # "memmap" = เขียน X ที่ scale แล้ว (float32) ลง train.memmap_dir แล้วอ่านผ่าน memory-map
+    kind = cfg["train"].get("dataset", "legacy")
+    with timer.stage("dataset"):
+        if tbptt:
+            # train/valid/test ติดกันใน df -> series เดียว แล้วอ้างตำแหน่งแบบ relative
+            base = int(tr_idx[0])
+            Z = torch.from_numpy(np.ascontiguousarray(transform(X[base:int(te_idx[-1]) + 1]), dtype=np.float32))
+            yz = torch.tensor(y[base:int(te_idx[-1]) + 1], dtype=torch.long)
+            T = int(cfg["train"].get("tbptt_len", seq_len))
+            streams = int(cfg["train"].get("tbptt_streams", 32))
+            context = int(cfg["train"].get("tbptt_context", 2016))
+            # แต่ละสายยาว L = (len(train) - off) // streams (off < T สุ่มทุก epoch) ต้องเกิน burn_in
+            # ไม่งั้นไม่มี loss เลย = train ทั้ง window โดยไม่มี optimizer step
+            burn_in = int(cfg["train"].get("tbptt_burn_in", 0))
+            if (len(tr_idx) - (T - 1)) // streams <= burn_in:
+                raise ValueError(f"tbptt: train window too short ({len(tr_idx)} rows) for tbptt_streams={streams}, "
+                                 f"tbptt_burn_in={burn_in}, tbptt_len={T}; "
+                                 f"need >= streams * (burn_in + 1) + tbptt_len - 1 rows")
+            ds_tr = StridedSeqDataset(Z[:len(tr_idx)].numpy(), yz[:len(tr_idx)].numpy(), seq_len)   # probe batch
+            def split_logits(idx):
+                # logits ที่ตรงกับ proba ของโหมด window: แถว idx[seq_len-1 : len(idx)-1]
+                a = int(idx[0]) - base
+                return stateful_logits(model, Z, a + seq_len - 1, a + len(idx) - 1, context, device, precision)
+        elif kind == "memmap":
+            base = os.path.join(cfg["train"].get("memmap_dir", "data/cache/memmap"), f"p{os.getpid()}")
+            ds_tr, ds_va, ds_te = (MemmapSeqDataset(write_memmap(f"{base}_{name}.npy", X, idx, transform), y[idx], seq_len)
+                                   for name, idx in (("tr", tr_idx), ("va", va_idx), ("te", te_idx)))
+        elif kind in ("legacy", "strided"):
+            Xtr, Xva, Xte = transform(X[tr_idx]), transform(X[va_idx]), transform(X[te_idx])
+            Seq = StridedSeqDataset if kind == "strided" else SeqDataset
+            ds_tr = Seq(Xtr, y[tr_idx], seq_len)
+            ds_va = Seq(Xva, y[va_idx], seq_len)
+            ds_te = Seq(Xte, y[te_idx], seq_len)
+        else:
+            raise ValueError(f"Unknown dataset: {kind}")
 
-    best_acc=-1; best_state=None; bad=0
-    for ep in range(cfg["train"]["max_epochs"]):
-        model.train()
-        for xb,yb in dl_tr:
-            xb,yb = xb.to(device), yb.to(device)
-            opt.zero_grad()
-            logits = model(xb)
-            loss = crit(logits, yb)
-            loss.backward()
-            opt.step()
-        # valid accuracy
-        model.eval(); corr=0; tot=0
-        with torch.no_grad():
-            for xb,yb in dl_va:
-                xb,yb = xb.to(device), yb.to(device)
-                pred = model(xb).argmax(1)
-                corr += (pred==yb).sum().item(); tot += len(yb)
-        acc = corr/tot if tot>0 else 0.0
+        if not tbptt:
+            dl_tr = make_loader(ds_tr, cfg["train"]["batch_size"], shuffle=True,
+                                num_workers=cfg["train"].get("num_workers", 0))
+            dl_te = make_loader(ds_te, 4096, shuffle=False)
+
+    with timer.stage("setup"):
+        model = LSTMClf(in_ch=len(feat_cols), hidden=64, layers=2, num_classes=3)
+        max_epochs, patience = cfg["train"]["max_epochs"], cfg["train"]["early_stop_patience"]
+        if init_state is not None:
+            model.load_state_dict(init_state)
+            # warm start มีงบ epoch/early stopping ของตัวเอง
+            max_epochs = cfg["train"].get("warm_max_epochs", max_epochs)
+            patience = cfg["train"].get("warm_patience", patience)
+        model = model.to(device)
+        # train.compile / train.precision (ดู src.utils.accel; ไม่รองรับ -> eager fp32)
+        # train.threads ตั้งครั้งเดียวใน run() (worker ของ parallel_windows ใช้ threads_per_worker แทน)
+        net, precision, run_mode = prepare_model(model, cfg["train"], device, ds_tr)
+        class_w = torch.tensor(cfg["train"]["class_weights"], dtype=torch.float32, device=device)
+        crit = nn.CrossEntropyLoss(weight=class_w)
+        opt = optim.Adam(model.parameters(), lr=cfg["train"]["lr"])
+
+    # validation: window mode ใช้ ValidationSet (หน้าต่างอยู่บน device, sync ครั้งเดียวต่อการประเมิน)
+    # train.eval_every_steps > 0: ประเมิน/early stopping ทุก N optimizer step แทนท้าย epoch (patience นับเป็นครั้งที่ประเมิน)
+    every = 0 if tbptt else int(cfg["train"].get("eval_every_steps", 0))
+    if not tbptt:
+        with timer.stage("dataset"):
+            vs = ValidationSet(Xva if kind != "memmap" else ds_va.X, y[va_idx], seq_len, device)
+
+    def validate():
+        model.eval()
+        if tbptt:
+            a = int(va_idx[0]) - base
+            yb = yz[a + seq_len - 1:a + len(va_idx) - 1].to(device)
+            logits = split_logits(va_idx)
+            if len(yb) == 0:
+                return 0.0, float("nan")
+            return ((logits.argmax(1) == yb).sum().item() / len(yb),
+                    nn.functional.cross_entropy(logits, yb, weight=class_w).item())
+        return vs.evaluate(net, class_w, autocast(device, precision))
+
+    best_acc=-1; best_state=None; bad=0; best_ep=0; ep=-1; best_loss=float("nan"); step=0; best_step=0
+    ck = load_checkpoint(*ckpt) if ckpt else None
+    if ck is not None:
+        model.load_state_dict(ck["model"]); opt.load_state_dict(ck["opt"]); torch.set_rng_state(ck["rng"])
+        best_acc, best_state, bad, best_ep, ep = ck["best_acc"], ck["best_state"], ck["bad"], ck["best_ep"], ck["epoch"]
+        best_loss, step, best_step = ck.get("best_loss", best_loss), ck.get("step", 0), ck.get("best_step", 0)
+        t_start -= ck["elapsed"]
+        print(f"Resume from checkpoint: epoch {ep + 1}")
+
+    def check() -> bool:
+        """ประเมิน valid แล้วอัปเดต early stopping; คืน True เมื่อควรหยุด"""
+        nonlocal best_acc, best_state, bad, best_ep, best_loss, best_step
+        with timer.stage("validation"):
+            acc, vloss = validate()
         if acc>best_acc:
-            best_acc=acc; best_state={k:v.cpu().clone() for k,v in model.state_dict().items()}; bad=0
+            best_acc=acc; best_state={k:v.cpu().clone() for k,v in model.state_dict().items()}; bad=0; best_ep=ep+1
+            best_loss, best_step = vloss, step
         else:
             bad+=1
-            if bad>=cfg["train"]["early_stop_patience"]:
-                break
+        return bad>=patience
+
+    t_steps = 0.0; n_seen = 0
+    # profile.trace_window: บันทึก torch.profiler trace ช่วงต้นของ train loop (ดู src.utils.profiler.trace)
+    timer.start_trace(cfg.get("profile", {}).get("trace_steps", 20), device.type == "cuda")
+    for ep in range(ep + 1 if bad < patience else max_epochs, max_epochs):
+        model.train()
+        t0 = time.perf_counter()
+        stop = False
+        if tbptt:
+            n_seen += tbptt_epoch(model, opt, crit, Z[:len(tr_idx)], yz[:len(tr_idx)], streams, T,
+                                  burn_in, device, precision, timer)
+        else:
+            # data = ดึง batch จาก DataLoader (รวม collation), forward รวมย้าย batch ขึ้น device และ loss
+            for xb,yb in timer.iterate("data", dl_tr):
+                with timer.stage("forward"):
+                    xb,yb = xb.to(device), yb.to(device)
+                    opt.zero_grad()
+                    with autocast(device, precision):
+                        logits = net(xb)
+                    loss = crit(logits.float(), yb)
+                with timer.stage("backward"):
+                    loss.backward()
+                with timer.stage("optimizer"):
+                    opt.step()
+                timer.step()
+                n_seen += len(yb)
+                step += 1
+                if every and step % every == 0:
+                    t_steps += time.perf_counter() - t0
+                    stop = check()
+                    model.train()
+                    t0 = time.perf_counter()
+                    if stop:
+                        break
+        t_steps += time.perf_counter() - t0
+        if not every:
+            stop = check()
+        if ckpt:
+            with timer.stage("checkpoint"):
+                save_checkpoint(ckpt[0], {"key": ckpt[1], "epoch": ep, "model": model.state_dict(),
+                                          "opt": opt.state_dict(), "rng": torch.get_rng_state(),
+                                          "best_acc": best_acc, "best_state": best_state, "bad": bad,
+                                          "best_ep": best_ep, "best_loss": best_loss, "step": step,
+                                          "best_step": best_step, "elapsed": time.perf_counter() - t_start})
+        if stop:
+            break
+    timer.stop_trace()
 
     # load best (if we have a best state, otherwise keep current)
     if best_state is not None:
@@ -74,81 +227,387 @@ def train_one_window(cfg: dict, df: pd.DataFrame, feat_cols: list, tr_idx, va_id
 
     # logits on test
     all_logits=[]
-    with torch.no_grad():
-        for xb,_ in dl_te:
-            xb = xb.to(device)
-            all_logits.append(model(xb).cpu().numpy())
-    logits = np.concatenate(all_logits, axis=0)
-    proba = softmax_np(logits)
-    return model.cpu(), scaler, proba
+    with timer.stage("test"):
+        if tbptt:
+            all_logits.append(split_logits(te_idx).cpu().numpy())
+        else:
+            with torch.no_grad(), autocast(device, precision):
+                for xb,_ in dl_te:
+                    xb = xb.to(device)
+                    all_logits.append(net(xb).float().cpu().numpy())
+        logits = np.concatenate(all_logits, axis=0)
+        proba = softmax_np(logits)
+    if kind == "memmap" and not tbptt:
+        for ds in (ds_tr, ds_va, ds_te):
+            ds.close()
+    info = {"epochs_run": ep + 1, "epochs_to_best": best_ep, "best_step": best_step,
+            "best_val_acc": float(best_acc), "best_val_loss": float(best_loss),
+            "train_seconds": time.perf_counter() - t_start,
+            "samples_per_s": n_seen / t_steps if t_steps > 0 else 0.0, "mode": run_mode}
+    return model.cpu(), scaler, proba, info
 
-def run(cfg_path="configs/config.yaml"):
-    cfg = yaml.safe_load(open(cfg_path, encoding="utf-8"))
+def tbptt_epoch(model, opt, crit, Z: torch.Tensor, yz: torch.Tensor, streams: int, T: int, burn_in: int,
+                device, precision: str, timer: StageTimer=None) -> int:
+    """
+    หนึ่ง epoch แบบ truncated BPTT: ตัด series train เป็น streams สายต่อเนื่อง เดินทีละ chunk ยาว T
+    ส่ง hidden state ต่อข้าม chunk (detach) และคิด loss ทุก timestep (ยกเว้น burn_in แท่งแรกของแต่ละสาย)
+    จุดเริ่มสุ่มใหม่ทุก epoch ให้ขอบ chunk ไม่ซ้ำเดิม; คืนจำนวน timestep ที่คิด loss
+    """
+    off = int(torch.randint(T, (1,)))
+    L = (len(Z) - off) // streams
+    if L <= 0:
+        return 0
+    xs = Z[off:off + streams * L].view(streams, L, -1)
+    ys = yz[off:off + streams * L].view(streams, L)
+    timer = StageTimer(False) if timer is None else timer
+    state, n = None, 0
+    for c in range(0, L, T):
+        with timer.stage("forward"):
+            xb, yb = xs[:, c:c+T].to(device), ys[:, c:c+T].to(device)
+            k0 = min(max(0, burn_in - c), xb.shape[1])
+            opt.zero_grad()
+            with autocast(device, precision):
+                logits, state = model.forward_seq(xb, state)
+            if k0 < xb.shape[1]:
+                loss = crit(logits[:, k0:].float().reshape(-1, logits.shape[-1]), yb[:, k0:].reshape(-1))
+        if k0 < xb.shape[1]:
+            with timer.stage("backward"):
+                loss.backward()
+            with timer.stage("optimizer"):
+                opt.step()
+            timer.step()
+            n += yb[:, k0:].numel()
+        state = tuple(h.detach() for h in state)
+    return n
 
-    # Load prepared data
-    df = pd.read_parquet("data/prepared/btc_5m_clean.parquet").sort_values("timestamp")
+def stateful_logits(model, Z: torch.Tensor, start: int, stop: int, context: int, device, precision: str,
+                    chunk: int=4096) -> torch.Tensor:
+    """logits ของแถว [start, stop) ของ Z โดยรัน LSTM ต่อเนื่องตั้งแต่ start - context (state เริ่มเป็น 0)"""
+    a = max(0, start - context)
+    out, state = [], None
+    with torch.no_grad(), autocast(device, precision):
+        for c in range(a, stop, chunk):
+            logits, state = model.forward_seq(Z[c:min(c + chunk, stop)][None].to(device), state)
+            out.append(logits[0].float())
+    return torch.cat(out)[start - a:] if out else torch.empty(0, 3, device=device)
 
-    # Features & labels
-    df = add_features(df, cfg)
-    df["target"] = make_triple_barrier_labels(
+def make_labels(df: pd.DataFrame, cfg: dict) -> pd.Series:
+    return make_triple_barrier_labels(
         df,
         cfg["label"]["atr_mult_tp"],
         cfg["label"]["atr_mult_sl"],
         cfg["label"]["max_holding"],
-        cfg["label"].get("min_move_bps", 0)
+        cfg["label"].get("min_move_bps", 0),
+        method=cfg["label"].get("method", "proxy"),
     )
+
+def prepare_frame(df: pd.DataFrame, cfg: dict, timer: StageTimer=None) -> pd.DataFrame:
+    timer = StageTimer(False) if timer is None else timer
+    # Features & labels (feature.cache: อ่าน/เขียน feature cache แทนการคำนวณซ้ำ)
+    if cfg["feature"].get("cache", False):
+        with timer.stage("feature_cache"):
+            df, info = cached_prepare(df, cfg, lambda d: make_labels(d, cfg),
+                                      cfg["feature"].get("cache_dir", "data/cache/features"))
+        print("Feature cache:", "hit" if info["hit"] else
+              f"computed {info['computed']}, labels {'cached' if info['labels_cached'] else 'computed'}")
+    else:
+        with timer.stage("add_features"):
+            df = add_features(df, cfg)
+        with timer.stage("labels"):
+            df["target"] = make_labels(df, cfg)
     
     # Convert labels from {-1, 0, 1} to {0, 1, 2} for PyTorch
     df["target"] = df["target"] + 1
     
-    df = df.dropna().reset_index(drop=True)
+    return df.dropna().reset_index(drop=True)
 
-    drop_cols = {"timestamp","open","high","low","close","volume","target"}
-    feat_cols = [c for c in df.columns if c not in drop_cols]
+def iter_windows(cfg: dict, timer: StageTimer=None):
+    """
+    yield (df, tr, va, te) ต่อ window
+    data.partitioned: โหลดจาก store แบบ year/month เฉพาะช่วง [t0 - warmup, s1 + max_holding]
+    ของแต่ละ window (หน่วยความจำโตตามขนาด window ไม่ใช่ประวัติทั้งหมด)
+    timer: จับเวลา load / add_features / labels (ระดับ run)
+    """
+    timer = StageTimer(False) if timer is None else timer
+    sp = cfg["split"]
+    split_args = (sp["train_months"], sp["valid_months"], sp["test_months"], sp["step_months"])
+    if not cfg["data"].get("partitioned", False):
+        # Load prepared data
+        with timer.stage("load"):
+            df = from_prepared(pd.read_parquet("data/prepared/btc_5m_clean.parquet").sort_values("timestamp"), cfg["data"])
+        df = prepare_frame(df, cfg, timer)
+        for tr, va, te in time_splits(df, *split_args):
+            yield df, tr, va, te
+        return
 
-    out_models = Path("outputs/models"); out_models.mkdir(parents=True, exist_ok=True)
-    out_metrics= Path("outputs/metrics"); out_metrics.mkdir(parents=True, exist_ok=True)
-    out_trades = Path("outputs/trades"); out_trades.mkdir(parents=True, exist_ok=True)
+    warm = pd.Timedelta(minutes=5 * feature_warmup_bars(cfg))
+    tail = pd.Timedelta(minutes=5 * (cfg["label"]["max_holding"] + 1))
+    ts = read_timestamps(PARTS_DIR)
+    # ต้นทางของ split ต้องนับหลังตัดแถว warm-up เหมือนโหมดโหลดทั้งไฟล์
+    def load(a, b):
+        with timer.stage("load"):
+            return from_prepared(read_range(PARTS_DIR, a, b), cfg["data"])
 
-    all_metrics = []
-    k=0
-    for tr,va,te in time_splits(df, cfg["split"]["train_months"], cfg["split"]["valid_months"], cfg["split"]["test_months"], cfg["split"]["step_months"]):
-        if len(tr)<cfg["train"]["seq_len"] or len(va)<cfg["train"]["seq_len"] or len(te)<cfg["train"]["seq_len"]:
-            continue
-
-        print(f"[Window {k}] train={len(tr)} valid={len(va)} test={len(te)}")
-        model, scaler, proba = train_one_window(cfg, df, feat_cols, tr, va, te)
-
-        # align test indices with proba (account for seq_len-1 offset)
-        te_idx_adj = te[cfg["train"]["seq_len"]-1:]
-        prices_te = df.loc[te_idx_adj, ["timestamp","close","atr"]].reset_index(drop=True)
-
-        metrics, trades = run_backtest(
-            prices_te, proba,
-            thr=cfg["trade"]["proba_threshold"],
-            fee_bps=cfg["trade"]["fee_bps"],
-            slippage_bps=cfg["trade"]["slippage_bps"],
-            atr_tp=cfg["trade"]["atr_mult_tp"],
-            atr_sl=cfg["trade"]["atr_mult_sl"],
-            max_holding=cfg["trade"]["max_holding"],
-        )
-        metrics["window"] = k
-        all_metrics.append(metrics)
+    head = prepare_frame(load(ts.iloc[0], ts.iloc[0] + 2 * warm + tail), cfg, timer)
+    if len(head):
+        ts = ts[ts >= head["timestamp"].iloc[0]]
+    for bounds in window_bounds(ts, *split_args):
+        t0, s1 = bounds[0], bounds[-1]
+        df = prepare_frame(load(t0 - warm, s1 + tail), cfg, timer)
+        tr, va, te = window_indices(df["timestamp"], bounds)
+        yield df, tr, va, te
+
+OUT_MODELS, OUT_METRICS, OUT_TRADES = Path("outputs/models"), Path("outputs/metrics"), Path("outputs/trades")
+OUT_PROBA = Path("outputs/proba")
+PROBA_COLS = ["p_short", "p_flat", "p_long"]
+
+def save_proba(path, prices: pd.DataFrame, proba: np.ndarray):
+    """
+    proba ของ test พร้อมราคาที่ align แล้ว (timestamp/open/high/low/close/atr) เป็น parquet หนึ่งไฟล์ต่อ window
+    prices ยาวกว่า proba (แท่งท้ายใช้เป็นแท่งออกเท่านั้น) -> แถวที่ไม่มี proba เป็น NaN
+    """
+    t = prices.copy()
+    for j, c in enumerate(PROBA_COLS):
+        col = np.full(len(t), np.nan, dtype=proba.dtype)
+        col[:len(proba)] = proba[:, j]
+        t[c] = col
+    t.to_parquet(path, index=False)
+
+def load_proba(path):
+    """คืน (prices, proba) จากไฟล์ของ save_proba; proba ยาวและ dtype เดิม (ผล backtest เท่ากับตอนเทรน)"""
+    t = pd.read_parquet(path)
+    P = t[PROBA_COLS].to_numpy()
+    has = np.flatnonzero(~np.isnan(P).all(axis=1))
+    return t.drop(columns=PROBA_COLS), P[:has[-1] + 1 if len(has) else 0]
+
+def load_proba_store(root=OUT_PROBA) -> dict:
+    """{k: (prices, proba)} ของทุก window ใน store เรียงตาม k"""
+    paths = {int(p.stem.removeprefix("proba_w")): p for p in Path(root).glob("proba_w*.parquet")}
+    return {k: load_proba(paths[k]) for k in sorted(paths)}
+
+def backtest_window(cfg: dict, prices: pd.DataFrame, proba: np.ndarray):
+    """run_backtest ด้วยค่าใน trade: ของ config คืน (metrics, trades)"""
+    return run_backtest(
+        prices, proba,
+        thr=cfg["trade"]["proba_threshold"],
+        fee_bps=cfg["trade"]["fee_bps"],
+        slippage_bps=cfg["trade"]["slippage_bps"],
+        atr_tp=cfg["trade"]["atr_mult_tp"],
+        atr_sl=cfg["trade"]["atr_mult_sl"],
+        max_holding=cfg["trade"]["max_holding"],
+        engine=cfg["trade"].get("engine", "vector"),
+        price_mode=cfg["trade"].get("price_mode", "close"),
+        tie=cfg["trade"].get("intrabar_tie", "sl"),
+    )
+
+def run_window(cfg: dict, df: pd.DataFrame, feat_cols: list, tr, va, te, k: int, chain: dict=None,
+               ckpt: tuple=None) -> dict:
+    """
+    เทรน + backtest หนึ่ง window แล้วบันทึก artifact ของ window k; คืน metrics
+    chain (warm start): dict ที่ส่งต่อระหว่าง window ติดกัน เก็บ best state (และ scaler) ของ window ก่อนหน้า
+    ckpt: (path, key) ของ epoch checkpoint (train.resume)
+    profile.enabled: metrics มีคีย์ "timings" (เวลาแต่ละขั้น, samples/s, peak RSS) ที่ run แยกไปเขียน timings.json
+    """
+    print(f"[Window {k}] train={len(tr)} valid={len(va)} test={len(te)}")
+    timer = make_timer(cfg)
+    if timer.enabled and cfg["profile"].get("trace_window") == k:
+        timer.trace_path = OUT_METRICS / f"trace_w{k}.json"
+    if cfg["train"].get("seed") is not None:
+        # seed ต่อ window: ผลไม่ขึ้นกับลำดับ/process ที่รัน (เทียบโหมดขนานกับทีละ window ได้)
+        torch.manual_seed(int(cfg["train"]["seed"]) + k)
+    chain = {} if chain is None else chain
+    warm = "state" in chain
+    model, scaler, proba, info = train_one_window(cfg, df, feat_cols, tr, va, te,
+                                                  init_state=chain.get("state"), scaler=chain.get("scaler"), ckpt=ckpt,
+                                                  timer=timer)
+    if cfg["train"].get("warm_start", False):
+        chain["state"] = model.state_dict()
+        if not cfg["train"].get("warm_refresh_scaler", True):
+            chain["scaler"] = scaler
+
+    # align test indices with proba (account for seq_len-1 offset)
+    te_idx_adj = te[cfg["train"]["seq_len"]-1:]
+    prices_te = df.loc[te_idx_adj, ["timestamp","open","high","low","close","atr"]].reset_index(drop=True)
+    prices_te = prices_te.astype({c: "float64" for c in ["open","high","low","close","atr"]})
 
-        # save artifacts
-        torch.save(model.state_dict(), out_models / f"lstm_w{k}.pt")
+    with timer.stage("backtest"):
+        metrics, trades = backtest_window(cfg, prices_te, proba)
+    metrics["window"] = k
+    metrics["warm_start"] = warm
+    metrics.update(info)
+
+    # save artifacts
+    with timer.stage("save"):
+        torch.save(model.state_dict(), OUT_MODELS / f"lstm_w{k}.pt")
         if hasattr(scaler, 'mean_') and scaler.mean_ is not None:
-            np.save(out_models / f"scaler_mean_w{k}.npy", scaler.mean_)
+            np.save(OUT_MODELS / f"scaler_mean_w{k}.npy", scaler.mean_)
         if hasattr(scaler, 'std_') and scaler.std_ is not None:
-            np.save(out_models / f"scaler_std_w{k}.npy", scaler.std_)
-        trades.to_parquet(out_trades / f"trades_w{k}.parquet", index=False)
-        k += 1
+            np.save(OUT_MODELS / f"scaler_std_w{k}.npy", scaler.std_)
+        trades.to_parquet(OUT_TRADES / f"trades_w{k}.parquet", index=False)
+        # proba + ราคาของ test: เปลี่ยนค่าใน trade: แล้วรัน backtest_only ได้โดยไม่ต้องเทรนใหม่
+        save_proba(OUT_PROBA / f"proba_w{k}.parquet", prices_te, proba)
+    if timer.enabled:
+        metrics["timings"] = {"window": k, **timer.report(), "train_seconds": info["train_seconds"],
+                              "samples_per_s": info["samples_per_s"], "pid": os.getpid()}
+        rss = metrics["timings"]["peak_rss_mb"]
+        print(f"[Window {k}] {timer.summary()} | {info['samples_per_s']:.0f} samples/s"
+              + (f" | peak RSS {rss:.0f} MB" if rss is not None else ""))
+    return metrics
+
+def share_frame(df: pd.DataFrame, root: str) -> dict:
+    """เขียนทุกคอลัมน์ของ df เป็น .npy เพื่อให้ worker เปิดแบบ memmap แทนการ pickle ทั้งเฟรม"""
+    os.makedirs(root, exist_ok=True)
+    tz = {}
+    for c in df.columns:
+        v = df[c]
+        if v.dtype.kind == "M" and v.dt.tz is not None:
+            tz[c] = str(v.dt.tz)
+            v = v.dt.tz_convert("UTC").dt.tz_localize(None)
+        np.save(os.path.join(root, f"{c}.npy"), v.to_numpy())
+    return {"root": root, "columns": list(df.columns), "tz": tz}
+
+def open_frame(spec: dict, lo: int, hi: int) -> pd.DataFrame:
+    """แถว [lo, hi) ของเฟรมที่ share_frame เขียนไว้ (copy เฉพาะช่วงของ window)"""
+    cols = {}
+    for c in spec["columns"]:
+        v = pd.Series(np.array(np.load(os.path.join(spec["root"], f"{c}.npy"), mmap_mode="r")[lo:hi]))
+        if c in spec["tz"]:
+            v = v.dt.tz_localize("UTC").dt.tz_convert(spec["tz"][c])
+        cols[c] = v
+    return pd.DataFrame(cols)
+
+def _init_worker(threads: int):
+    torch.set_num_threads(threads)
+
+def _window_task(cfg: dict, spec: dict, lo: int, hi: int, feat_cols: list, tr, va, te, k: int, ckpt: tuple) -> dict:
+    return run_window(cfg, open_frame(spec, lo, hi), feat_cols, tr - lo, va - lo, te - lo, k, ckpt=ckpt)
+
+def _load_scaler(cfg: dict, k: int):
+    """scaler ของ window k จาก artifact (ใช้ต่อ warm start เมื่อข้าม window ที่เสร็จแล้ว)"""
+    mode = cfg["train"].get("scaler", "standard")
+    if mode == "standard":
+        scaler = RollingStandardScaler()
+    else:
+        scaler = StreamingScaler(window=cfg["train"].get("scaler_window", 2016) if mode == "rolling" else None)
+    scaler.mean_ = np.load(OUT_MODELS / f"scaler_mean_w{k}.npy")
+    scaler.std_ = np.load(OUT_MODELS / f"scaler_std_w{k}.npy")
+    return scaler
+
+def run(cfg_path="configs/config.yaml"):
+    cfg = yaml.safe_load(open(cfg_path, encoding="utf-8"))
+
+    for d in (OUT_MODELS, OUT_METRICS, OUT_TRADES, OUT_PROBA):
+        d.mkdir(parents=True, exist_ok=True)
+
+    drop_cols = {"timestamp","open","high","low","close","volume","target"}
+    seq_len = cfg["train"]["seq_len"]
+
+    # train.resume: run_manifest.json (คีย์ = config_hash) บอก window ที่เสร็จแล้ว -> ข้าม;
+    # window ที่ค้างกลางทางเริ่มต่อจาก checkpoint ท้าย epoch ใน train.checkpoint_dir
+    resume = cfg["train"].get("resume", False)
+    run_key = config_hash(cfg)
+    man_path = OUT_METRICS / "run_manifest.json"
+    man = load_manifest(man_path)
+    if man.get("config_hash") != run_key or not resume:
+        if resume and man:
+            print("Config changed since the last run -> starting from window 0")
+        man = {"config_hash": run_key, "windows": {}}
+    ckpt_dir = Path(cfg["train"].get("checkpoint_dir", "outputs/checkpoints"))
+    # profile.enabled: เวลาแต่ละขั้นระดับ run (load/add_features/labels) + ต่อ window -> timings.json
+    timer, t_run, timings = make_timer(cfg), time.perf_counter(), {}
+
+    def windows():
+        k = 0
+        for df,tr,va,te in iter_windows(cfg, timer):
+            feat_cols = [c for c in df.columns if c not in drop_cols]
+            if len(tr)<seq_len or len(va)<seq_len or len(te)<seq_len:
+                continue
+            wkey = f"{df['timestamp'].iloc[tr[0]].isoformat()}/{df['timestamp'].iloc[te[-1]].isoformat()}"
+            yield k, wkey, df, feat_cols, tr, va, te
+            k += 1
+
+    def done(k, wkey):
+        e = man["windows"].get(str(k))
+        return (resume and e is not None and e["key"] == wkey
+                and (OUT_MODELS / f"lstm_w{k}.pt").exists() and (OUT_TRADES / f"trades_w{k}.parquet").exists())
+
+    def ckpt(k, wkey):
+        return (str(ckpt_dir / f"w{k}.pt"), f"{run_key}/{wkey}") if resume else None
+
+    def finish(k, wkey, metrics):
+        if "timings" in metrics:
+            timings[k] = metrics.pop("timings")
+        man["windows"][str(k)] = {"key": wkey, "metrics": metrics}
+        save_manifest(man_path, man)
+        if resume and os.path.exists(ckpt_dir / f"w{k}.pt"):
+            os.remove(ckpt_dir / f"w{k}.pt")
+
+    # train.parallel_windows > 1: ส่งแต่ละ window เข้า process pool (window เป็นอิสระต่อกัน)
+    # เฟรมถูกเขียนเป็น .npy ครั้งเดียวต่อเฟรม แล้ว worker เปิดแบบ memmap เฉพาะช่วงของ window
+    n_par = int(cfg["train"].get("parallel_windows", 1))
+    warm_start = cfg["train"].get("warm_start", False)
+    if n_par > 1 and warm_start:
+        print("warm_start needs the previous window's model -> windows run sequentially")
+        n_par = 1
+    results = {}
+    if n_par <= 1:
+        apply_threads(cfg["train"])
+        chain = {}   # warm start: state ของ window ก่อนหน้า
+        for k, wkey, df, feat_cols, tr, va, te in windows():
+            if done(k, wkey):
+                print(f"[Window {k}] already complete -> skip")
+                results[k] = man["windows"][str(k)]["metrics"]
+                if warm_start:
+                    chain["state"] = torch.load(OUT_MODELS / f"lstm_w{k}.pt", map_location="cpu")
+                    if not cfg["train"].get("warm_refresh_scaler", True):
+                        chain.setdefault("scaler", _load_scaler(cfg, k))
+                continue
+            results[k] = run_window(cfg, df, feat_cols, tr, va, te, k, chain, ckpt=ckpt(k, wkey))
+            finish(k, wkey, results[k])
+    else:
+        threads = int(cfg["train"].get("threads_per_worker", 0)) or max(1, (os.cpu_count() or 1) // n_par)
+        share_dir = cfg["train"].get("share_dir", "data/cache/shared")
+        os.makedirs(share_dir, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=share_dir, prefix="run_")
+        back = cfg["train"].get("scaler_window", 0) if cfg["train"].get("scaler") == "rolling" else 0
+        try:
+            with ProcessPoolExecutor(n_par, mp_context=mp.get_context("spawn"),
+                                     initializer=_init_worker, initargs=(threads,)) as ex:
+                futs, shared = {}, (None, None)
+                for k, wkey, df, feat_cols, tr, va, te in windows():
+                    if done(k, wkey):
+                        print(f"[Window {k}] already complete -> skip")
+                        results[k] = man["windows"][str(k)]["metrics"]
+                        continue
+                    if shared[0] is not df:
+                        shared = (df, share_frame(df, os.path.join(tmp, f"frame{k}")))
+                    lo, hi = max(0, int(tr[0]) - back), int(te[-1]) + 1
+                    fut = ex.submit(_window_task, cfg, shared[1], lo, hi, feat_cols, tr, va, te, k, ckpt(k, wkey))
+                    futs[fut] = (k, wkey)
+                for fut in as_completed(futs):
+                    k, wkey = futs[fut]
+                    results[k] = fut.result()
+                    finish(k, wkey, results[k])
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+    all_metrics = [results[k] for k in sorted(results)]   # ลำดับเดียวกับ window
 
     if not all_metrics:
         print("No windows produced metrics. Check config date coverage & data size.")
         return
 
-    with open(out_metrics / "metrics_windows.json", "w") as f:
+    summary = write_results(all_metrics)
+
+    if timer.enabled:
+        with open(OUT_METRICS / "timings.json", "w") as f:
+            json.dump({"run": {**timer.report(), "total_seconds": time.perf_counter() - t_run,
+                               "peak_rss_children_mb": peak_rss_mb(children=True)},
+                       "windows": [timings[k] for k in sorted(timings)]}, f, indent=2)
+    print("Summary:", summary)
+
+def write_results(all_metrics: list) -> dict:
+    """เขียน metrics_windows.json และ summary.json; คืน summary"""
+    with open(OUT_METRICS / "metrics_windows.json", "w") as f:
         json.dump(all_metrics, f, indent=2)
 
     # summary
@@ -161,6 +620,38 @@ def run(cfg_path="configs/config.yaml"):
         "median_total_return_equity": float(dfm["total_return_equity"].median()),
         "median_max_drawdown": float(dfm["max_drawdown"].median()),
     }
-    with open(out_metrics / "summary.json", "w") as f:
+    if "intrabar_changed" in dfm:
+        summary["sum_intrabar_changed"] = int(dfm["intrabar_changed"].sum())
+    # ค่าฝั่งเทรน (ไม่มีเมื่อ backtest_only ไม่พบ metrics เดิม)
+    if "epochs_to_best" in dfm:
+        summary["median_epochs_to_best"] = float(dfm["epochs_to_best"].median())
+    if "train_seconds" in dfm:
+        summary["total_train_seconds"] = float(dfm["train_seconds"].sum())
+    with open(OUT_METRICS / "summary.json", "w") as f:
         json.dump(summary, f, indent=2)
+    return summary
+
+def backtest_only(cfg_path="configs/config.yaml"):
+    """
+    backtest ใหม่จาก proba ที่เก็บไว้ (outputs/proba) ด้วยค่าใน trade: ปัจจุบัน โดยไม่เทรนใหม่
+    เขียน trades_w{k}.parquet, metrics_windows.json, summary.json ใหม่; ค่าฝั่งเทรน (epochs, เวลา ...) คงจากไฟล์เดิม
+    """
+    cfg = yaml.safe_load(open(cfg_path, encoding="utf-8"))
+    store = load_proba_store()
+    if not store:
+        print(f"No stored probabilities in {OUT_PROBA} -> run training first")
+        return
+    OUT_TRADES.mkdir(parents=True, exist_ok=True)
+    prev_path = OUT_METRICS / "metrics_windows.json"
+    prev = {m["window"]: m for m in json.load(open(prev_path))} if prev_path.exists() else {}
+
+    all_metrics = []
+    for k, (prices, proba) in store.items():
+        metrics, trades = backtest_window(cfg, prices, proba)
+        metrics["window"] = k
+        metrics.update({c: v for c, v in prev.get(k, {}).items() if c not in BACKTEST_KEYS})
+        trades.to_parquet(OUT_TRADES / f"trades_w{k}.parquet", index=False)
+        all_metrics.append(metrics)
+    summary = write_results(all_metrics)
+    print(f"Backtest-only: {len(all_metrics)} windows from {OUT_PROBA}")
     print("Summary:", summary)
@@ -0,0 +1,59 @@
+"""
+ตัวเลือกเร่งการเทรนบน CPU (config: train.compile, train.precision, train.threads, train.interop_threads)
+ทุกโหมดทดลองรันกับ batch จริงก่อนใช้; ถ้าเครื่องไม่รองรับจะถอยกลับเป็น eager/fp32 พร้อมพิมพ์เหตุผล
+"""
+import contextlib
+import torch
+
+def apply_threads(cfg_train: dict):
+    """train.threads / train.interop_threads (0 = ค่าเดิมของ torch)"""
+    n = int(cfg_train.get("threads", 0))
+    if n > 0:
+        torch.set_num_threads(n)
+    n = int(cfg_train.get("interop_threads", 0))
+    if n > 0:
+        try:
+            torch.set_num_interop_threads(n)
+        except RuntimeError:
+            # ตั้งได้ครั้งเดียวก่อนเริ่มงานขนาน (เช่น window ที่สองเป็นต้นไป)
+            pass
+
+def autocast(device: torch.device, precision: str):
+    if precision == "bf16":
+        return torch.autocast(device.type, dtype=torch.bfloat16)
+    return contextlib.nullcontext()
+
+def prepare_model(model: torch.nn.Module, cfg_train: dict, device: torch.device, ds):
+    """
+    คืน (net สำหรับ forward, precision ที่ใช้ได้จริง, ชื่อโหมด); ds = train dataset (ใช้ทำ probe batch)
+    net อาจเป็น torch.compile(model) ที่แชร์พารามิเตอร์กับ model (state_dict ยังอ่าน/เขียนผ่าน model)
+    train.mode="tbptt" เรียก model.forward_seq ตรง ๆ ไม่ผ่าน net จึงไม่ compile (โหมดที่รายงานเป็น eager+...)
+    """
+    precision = cfg_train.get("precision", "fp32")
+    if precision not in ("fp32", "bf16"):
+        raise ValueError(f"Unknown precision: {precision}")
+    net = model
+    compile_ = cfg_train.get("compile", False) and cfg_train.get("mode", "window") != "tbptt"
+    if not compile_ and precision == "fp32":
+        return model, "fp32", "eager+fp32"
+    if compile_:
+        try:
+            net = torch.compile(model)
+        except Exception as e:
+            print(f"torch.compile unavailable ({type(e).__name__}) -> eager")
+    # probe ขนาด batch จริงโดยไม่แตะ RNG ของ sampler
+    xb = torch.stack([ds[i][0] for i in range(min(int(cfg_train["batch_size"]), len(ds)))]).to(device)
+    for attempt in ((net, precision), (net, "fp32"), (model, "fp32")):
+        cand, prec = attempt
+        try:
+            # probe forward/backward (compile เกิดที่นี่ ไม่ปนกับเวลาเทรน); ไม่ step optimizer
+            with autocast(device, prec):
+                out = cand(xb)
+            out.float().sum().backward()
+            model.zero_grad(set_to_none=True)
+        except Exception as e:
+            model.zero_grad(set_to_none=True)
+            print(f"{'compile' if cand is not model else 'eager'}+{prec} failed ({type(e).__name__}) -> fallback")
+            continue
+        return cand, prec, f"{'compile' if cand is not model else 'eager'}+{prec}"
+    return model, "fp32", "eager+fp32"
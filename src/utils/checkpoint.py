@@ -0,0 +1,42 @@
+"""
+สถานะของ walk-forward run สำหรับรันต่อ (train.resume)
+- config_hash: คีย์ของ run (ไม่นับค่าที่ไม่กระทบผล เช่น จำนวน worker)
+- checkpoint ท้าย epoch ของ window ที่กำลังเทรน (model + optimizer + early stopping + RNG)
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+import torch
+
+# ค่าที่เปลี่ยนแล้วผลไม่เปลี่ยน (วิธีโหลด/จำนวน worker/ที่พักไฟล์) -> ไม่นับใน config_hash
+RUNTIME_KEYS = {
+    "data": {"load_workers", "load_executor", "arrow_parquet", "regular_engine", "incremental", "partitioned"},
+    "feature": {"cache", "cache_dir"},
+    "train": {"device", "num_workers", "parallel_windows", "threads_per_worker", "share_dir", "memmap_dir",
+              "resume", "checkpoint_dir"},
+    "profile": {"enabled", "trace_window", "trace_steps"},
+    "trade": {"engine"},
+    "bootstrap": {"n_resamples", "method", "block_len", "ci", "seed"},
+    "trade_grid": {"proba_threshold", "atr_mult_tp", "atr_mult_sl", "max_holding", "fee_bps", "slippage_bps", "workers"},
+    "label_grid": {"method", "atr_mult_tp", "atr_mult_sl", "max_holding", "min_move_bps", "min_class_frac"},
+}
+
+def config_hash(cfg: dict) -> str:
+    c = {sec: ({k: v for k, v in val.items() if k not in RUNTIME_KEYS.get(sec, ())} if isinstance(val, dict) else val)
+         for sec, val in cfg.items()}
+    return hashlib.sha256(json.dumps(c, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def save_checkpoint(path: str, state: dict):
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_suffix(".tmp")
+    torch.save(state, tmp)
+    os.replace(tmp, p)
+
+def load_checkpoint(path: str, key: str):
+    """checkpoint ที่ key ตรงกัน หรือ None (ไม่มีไฟล์/ของ config หรือ window อื่น)"""
+    if not os.path.exists(path):
+        return None
+    state = torch.load(path, map_location="cpu", weights_only=False)
+    return state if state.get("key") == key else None
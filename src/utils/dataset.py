@@ -1,6 +1,8 @@
+import os
+from collections import deque
 import numpy as np
 import torch
-from torch.utils.data import Dataset
+from torch.utils.data import Dataset, DataLoader, BatchSampler, RandomSampler, SequentialSampler
 
 class RollingStandardScaler:
     def __init__(self, eps=1e-6):
@@ -14,6 +16,125 @@ class RollingStandardScaler:
     def transform(self, X: np.ndarray):
         return (X - self.mean_) / self.std_
 
+class StreamingScaler:
+    """
+    Standard scaler แบบสะสม: partial_fit รวมสถิติทีละ chunk (Welford/Chan) จึง fit จาก memmap/partition ได้
+    transform คืน float32 (inplace=True กับ X float32 = แก้ใน array เดิม)
+    window=N: rolling_transform ทำ normalization แบบ causal ด้วย mean/std ของ N แท่งล่าสุด (รวมแท่งปัจจุบัน)
+    คำนวณจาก cumulative sum ใน O(n); update() ใช้กับข้อมูล live ทีละแท่ง
+    """
+    def __init__(self, eps=1e-6, window: int=None):
+        self.eps = eps
+        self.window = window
+        self.n_ = 0
+        self.mean_ = None
+        self.std_ = None
+        self._m2 = None
+        self._buf = None    # สำหรับ update() แบบ rolling
+
+    def partial_fit(self, X: np.ndarray):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        nb = len(X)
+        if nb == 0:
+            return self
+        mb = X.mean(axis=0)
+        m2b = ((X - mb) ** 2).sum(axis=0)
+        if self.n_ == 0:
+            self.mean_, self._m2 = mb, m2b
+        else:
+            # Chan et al.: รวม (n, mean, M2) ของสองก้อน
+            n = self.n_ + nb
+            delta = mb - self.mean_
+            self.mean_ = self.mean_ + delta * (nb / n)
+            self._m2 = self._m2 + m2b + delta * delta * (self.n_ * nb / n)
+        self.n_ += nb
+        self.std_ = np.sqrt(self._m2 / self.n_) + self.eps
+        return self
+
+    def fit(self, X: np.ndarray, rows=None, chunk: int=1 << 16):
+        """fit ใหม่ทีละ chunk; rows = index ของแถวที่ใช้ (ไม่ต้องสร้าง X[rows] ทั้งก้อน)"""
+        self.n_ = 0
+        if rows is None:
+            for a in range(0, len(X), chunk):
+                self.partial_fit(X[a:a+chunk])
+        else:
+            for a in range(0, len(rows), chunk):
+                self.partial_fit(X[rows[a:a+chunk]])
+        return self
+
+    def transform(self, X: np.ndarray, inplace: bool=False, chunk: int=1 << 16) -> np.ndarray:
+        if inplace and isinstance(X, np.ndarray) and X.dtype == np.float32 and X.flags.writeable:
+            X -= self.mean_.astype(np.float32)
+            X /= self.std_.astype(np.float32)
+            return X
+        out = np.empty(np.shape(X), dtype=np.float32)
+        for a in range(0, len(out), chunk):
+            out[a:a+chunk] = (X[a:a+chunk] - self.mean_) / self.std_
+        return out
+
+    def rolling_transform(self, X: np.ndarray, chunk: int=1 << 16) -> np.ndarray:
+        """
+        z[t] = (x[t] - mean(x[t-N+1..t])) / (std(...) + eps); ช่วงต้นที่ยังไม่ครบ N ใช้ทุกแถวที่มี
+        ลบ shift (mean จาก fit หรือแถวแรก) ก่อนสะสม เพื่อลดการหักล้างของ sum(x^2)
+        """
+        X = np.asarray(X)
+        n, f = X.shape
+        w = int(self.window)
+        shift = self.mean_ if self.mean_ is not None else (X[0].astype(np.float64) if n else np.zeros(f))
+        c1 = np.zeros((n + 1, f))
+        c2 = np.zeros((n + 1, f))
+        for a in range(0, n, chunk):
+            d = X[a:a+chunk] - shift
+            np.cumsum(d, axis=0, out=c1[a+1:a+1+len(d)])
+            np.cumsum(d * d, axis=0, out=c2[a+1:a+1+len(d)])
+            c1[a+1:a+1+len(d)] += c1[a]
+            c2[a+1:a+1+len(d)] += c2[a]
+        out = np.empty((n, f), dtype=np.float32)
+        for a in range(0, n, chunk):
+            t = np.arange(a + 1, min(a + chunk, n) + 1)
+            lo = np.maximum(t - w, 0)
+            cnt = (t - lo)[:, None]
+            m = (c1[t] - c1[lo]) / cnt
+            var = np.maximum((c2[t] - c2[lo]) / cnt - m * m, 0.0)
+            out[a:a+len(t)] = (X[a:a+len(t)] - shift - m) / (np.sqrt(var) + self.eps)
+        return out
+
+    def update(self, x: np.ndarray, learn: bool=False) -> np.ndarray:
+        """
+        แท่งใหม่ 1 แท่ง (live): rolling -> เลื่อนหน้าต่าง N แท่งด้วย running sum (O(1)) แล้ว normalize
+        ไม่ใช่ rolling -> ใช้สถิติที่ fit ไว้ (learn=True = รวมแท่งนี้เข้าสถิติด้วย)
+        """
+        x = np.asarray(x, dtype=np.float64)
+        if self.window is None:
+            if learn or self.mean_ is None:
+                self.partial_fit(x)
+            return ((x - self.mean_) / self.std_).astype(np.float32)
+        if self._buf is None:
+            self._shift = self.mean_ if self.mean_ is not None else x.copy()
+            self._buf = deque(maxlen=int(self.window))
+            self._s1 = np.zeros_like(x)
+            self._s2 = np.zeros_like(x)
+            self._seen = 0
+        d = x - self._shift
+        if len(self._buf) == self._buf.maxlen:
+            old = self._buf[0]
+            self._s1 -= old
+            self._s2 -= old * old
+        self._buf.append(d)
+        self._s1 += d
+        self._s2 += d * d
+        self._seen += 1
+        if self._seen % 4096 == 0:
+            # รวมใหม่จาก buffer กัน drift ของ running sum
+            win = np.asarray(self._buf)
+            self._s1, self._s2 = win.sum(axis=0), (win * win).sum(axis=0)
+        cnt = len(self._buf)
+        m = self._s1 / cnt
+        var = np.maximum(self._s2 / cnt - m * m, 0.0)
+        return ((d - m) / (np.sqrt(var) + self.eps)).astype(np.float32)
+
 class SeqDataset(Dataset):
     def __init__(self, feats: np.ndarray, labels: np.ndarray, seq_len: int):
         self.X = feats
@@ -25,3 +146,105 @@ class SeqDataset(Dataset):
         x = self.X[idx:idx+self.seq_len]
         y = self.y[idx+self.seq_len-1]
         return torch.from_numpy(x).float(), torch.tensor(y).long()
+
+class StridedSeqDataset(Dataset):
+    """
+    เหมือน SeqDataset แต่เก็บฟีเจอร์เป็น float32 tensor ก้อนเดียว และมองหน้าต่างเป็น strided view (ไม่ copy)
+    __getitem__ รับ index ทั้ง batch (list/tensor) แล้วดึงด้วย fancy index ครั้งเดียว
+    ใช้คู่กับ make_loader (BatchSampler) แทนการ collate ทีละ sample
+    """
+    batched = True
+    def __init__(self, feats: np.ndarray, labels: np.ndarray, seq_len: int):
+        self.X = torch.from_numpy(np.ascontiguousarray(feats, dtype=np.float32))
+        self.y = torch.as_tensor(np.asarray(labels), dtype=torch.long)
+        self.seq_len = seq_len
+        n, f = self.X.shape
+        m = max(0, n - seq_len + 1)
+        self.windows = self.X.as_strided((m, seq_len, f), (f, f, 1))   # [N,T,F] view
+    def __len__(self):
+        return max(0, len(self.X) - self.seq_len)
+    def __getitem__(self, idx):
+        idx = torch.as_tensor(idx, dtype=torch.long)
+        return self.windows[idx], self.y[idx + self.seq_len - 1]
+
+def make_loader(ds: Dataset, batch_size: int, shuffle: bool, num_workers: int=0) -> DataLoader:
+    """DataLoader ของทุก dataset: แบบ batched (Strided/Memmap) ดึงทีละ batch ผ่าน BatchSampler"""
+    if getattr(ds, "batched", False):
+        base = RandomSampler(ds) if shuffle else SequentialSampler(ds)
+        return DataLoader(ds, sampler=BatchSampler(base, batch_size, drop_last=False), batch_size=None,
+                          num_workers=num_workers)
+    return DataLoader(ds, batch_size=batch_size, shuffle=shuffle, num_workers=num_workers)
+
+def write_memmap(path: str, X: np.ndarray, rows, transform, chunk: int=1 << 16) -> str:
+    """transform(X[rows]) ลงไฟล์ .npy float32 ทีละ chunk (ไม่มีสำเนา float64 ของทั้ง split)"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(len(rows), X.shape[1]))
+    for a in range(0, len(rows), chunk):
+        out[a:a+chunk] = transform(X[rows[a:a+chunk]])
+    out.flush()
+    del out
+    return path
+
+class MemmapSeqDataset(Dataset):
+    """
+    หน้าต่าง sequence จากไฟล์ .npy แบบ memory-map (เขียนด้วย write_memmap)
+    เก็บแค่ path แล้วเปิด map เมื่อใช้ครั้งแรกในแต่ละ process -> worker ของ DataLoader
+    ใช้ page cache ร่วมกัน ไม่ต้อง pickle ข้อมูล; ดึงทีละ batch เหมือน StridedSeqDataset
+    """
+    batched = True
+    def __init__(self, path: str, labels: np.ndarray, seq_len: int):
+        self.path = path
+        self.y = torch.as_tensor(np.asarray(labels), dtype=torch.long)
+        self.seq_len = seq_len
+        self.n = len(np.load(path, mmap_mode="r"))
+        self._X = None
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_X"] = None
+        return state
+    @property
+    def X(self) -> np.ndarray:
+        if self._X is None:
+            self._X = np.load(self.path, mmap_mode="r")
+        return self._X
+    def close(self):
+        """ปล่อย map แล้วลบไฟล์ (เรียกหลังใช้ window เสร็จ)"""
+        self._X = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+    def __len__(self):
+        return max(0, self.n - self.seq_len)
+    def __getitem__(self, idx):
+        idx = np.asarray(idx, dtype=np.int64)
+        rows = idx[..., None] + np.arange(self.seq_len)
+        return torch.from_numpy(self.X[rows]), self.y[torch.from_numpy(idx + self.seq_len - 1)]
+
+class ValidationSet:
+    """
+    หน้าต่าง validation ทั้งหมดอยู่บน device ครั้งเดียว (strided view ของ tensor ต่อเนื่อง, ลำดับ/ป้ายเดียวกับ SeqDataset)
+    evaluate() สะสม correct/loss เป็น tensor บน device แล้ว sync กลับ host ครั้งเดียว
+    """
+    def __init__(self, feats: np.ndarray, labels: np.ndarray, seq_len: int, device, batch_size: int=4096):
+        X = torch.from_numpy(np.array(feats, dtype=np.float32)).to(device)   # copy: รับ memmap อ่านอย่างเดียวได้
+        n, f = X.shape
+        m = max(0, n - seq_len)
+        self.windows = X.as_strided((m, seq_len, f), (f, f, 1))
+        self.y = torch.as_tensor(np.asarray(labels)[seq_len - 1:seq_len - 1 + m], dtype=torch.long).to(device)
+        self.batch_size = batch_size
+    def __len__(self):
+        return len(self.y)
+    def evaluate(self, net, weight: torch.Tensor=None, ctx=None):
+        """คืน (accuracy, weighted cross-entropy เฉลี่ยแบบเดียวกับ CrossEntropyLoss(weight))"""
+        if len(self.y) == 0:
+            return 0.0, float("nan")
+        corr = torch.zeros((), device=self.y.device)
+        loss = torch.zeros((), device=self.y.device)
+        with torch.no_grad(), (ctx if ctx is not None else torch.autocast(self.y.device.type, enabled=False)):
+            for a in range(0, len(self.y), self.batch_size):
+                logits = net(self.windows[a:a+self.batch_size]).float()
+                yb = self.y[a:a+self.batch_size]
+                corr += (logits.argmax(1) == yb).sum()
+                loss += torch.nn.functional.cross_entropy(logits, yb, weight=weight, reduction="sum")
+        denom = weight[self.y].sum() if weight is not None else torch.tensor(float(len(self.y)))
+        c, l, d = torch.stack([corr, loss, denom.to(loss.device)]).cpu().tolist()
+        return c / len(self.y), l / d
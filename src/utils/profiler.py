@@ -0,0 +1,112 @@
+"""
+จับเวลาแต่ละขั้นของ walk-forward run (config: profile.*)
+StageTimer สะสมเวลา/จำนวนครั้งต่อชื่อขั้น (features, data, forward, backward, optimizer, validation, backtest ...)
+ปิดอยู่ (profile.enabled: false) = stage() คืน context ว่างตัวเดียวกันทุกครั้ง, iterate() คืน iterable เดิม
+ไม่เรียก perf_counter/synchronize เลย
+"""
+import contextlib
+import time
+import torch
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+_NULL = contextlib.nullcontext()
+
+class _Stage:
+    __slots__ = ("timer", "name", "t0", "rf")
+
+    def __init__(self, timer, name):
+        self.timer, self.name = timer, name
+
+    def __enter__(self):
+        t = self.timer
+        # ระหว่าง trace ให้ขั้นปรากฏเป็นช่วงชื่อเดียวกันใน torch.profiler
+        self.rf = torch.profiler.record_function(self.name) if t.tracing else None
+        if self.rf is not None:
+            self.rf.__enter__()
+        self.t0 = time.perf_counter()
+
+    def __exit__(self, *exc):
+        t = self.timer
+        if t.sync:
+            torch.cuda.synchronize()
+        t.add(self.name, time.perf_counter() - self.t0)
+        if self.rf is not None:
+            self.rf.__exit__(*exc)
+
+class StageTimer:
+    def __init__(self, enabled: bool=True):
+        self.enabled = enabled
+        self.sync = False      # True บน CUDA: รอ kernel จบก่อนจับเวลา (ไม่งั้นเวลาไปตกที่ขั้นถัดไป)
+        self.tracing = False
+        self.trace_path = None  # ตั้งโดยผู้เรียกเมื่อ window นี้ต้องเก็บ torch.profiler trace
+        self.prof = None
+        self.seconds, self.calls = {}, {}
+
+    def stage(self, name: str):
+        return _Stage(self, name) if self.enabled else _NULL
+
+    def add(self, name: str, seconds: float, calls: int=1):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + calls
+
+    def iterate(self, name: str, it):
+        """วนตาม it โดยจับเวลาการดึงแต่ละ item (เช่น collation ของ DataLoader) เป็นขั้น name"""
+        if not self.enabled:
+            return it
+        return self._iterate(name, it)
+
+    def _iterate(self, name, it):
+        it = iter(it)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+            yield item
+
+    def start_trace(self, steps: int, cuda: bool=False):
+        if self.enabled and self.trace_path:
+            self.prof = trace(str(self.trace_path), steps, cuda)
+            self.prof.__enter__()
+            self.tracing = True
+
+    def step(self):
+        if self.prof is not None:
+            self.prof.step()
+
+    def stop_trace(self):
+        if self.prof is not None:
+            self.prof.__exit__(None, None, None)
+            self.prof, self.tracing = None, False
+
+    def report(self) -> dict:
+        return {"stages": {k: {"seconds": self.seconds[k], "calls": self.calls[k]} for k in self.seconds},
+                "peak_rss_mb": peak_rss_mb()}
+
+    def summary(self) -> str:
+        return " ".join(f"{k} {v:.2f}s" for k, v in self.seconds.items())
+
+def make_timer(cfg: dict) -> StageTimer:
+    return StageTimer(bool(cfg.get("profile", {}).get("enabled", False)))
+
+def peak_rss_mb(children: bool=False):
+    """peak resident set size ของ process นี้ (children=True: process ลูกที่จบแล้ว เช่น worker pool); ไม่รองรับ = None"""
+    if resource is None:
+        return None
+    kb = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return kb / 1024.0
+
+def trace(path: str, steps: int, cuda: bool=False):
+    """
+    torch.profiler รอบ train loop: ข้าม 1 step, warm-up 1 step แล้วบันทึก steps step เป็น chrome trace ที่ path
+    (เปิดด้วย chrome://tracing หรือ Perfetto); ผู้เรียกต้อง .step() ทุก optimizer step
+    """
+    acts = [torch.profiler.ProfilerActivity.CPU] + ([torch.profiler.ProfilerActivity.CUDA] if cuda else [])
+    return torch.profiler.profile(activities=acts,
+                                  schedule=torch.profiler.schedule(wait=1, warmup=1, active=int(steps), repeat=1),
+                                  on_trace_ready=lambda p: p.export_chrome_trace(path))
@@ -1,8 +1,9 @@
 import numpy as np
 import pandas as pd
 
-def time_splits(df: pd.DataFrame, train_m: int, valid_m: int, test_m: int, step_m: int):
-    ts = pd.to_datetime(df["timestamp"], utc=True)
+def window_bounds(ts: pd.Series, train_m: int, valid_m: int, test_m: int, step_m: int):
+    """ขอบเวลา (t0, t1, v1, s1) ของแต่ละ window: train=[t0,t1) valid=[t1,v1) test=[v1,s1)"""
+    ts = pd.to_datetime(ts, utc=True)
     cur = ts.min().normalize() + pd.Timedelta(days=1)
     end = ts.max()
     while cur + pd.DateOffset(months=train_m+valid_m+test_m) <= end:
@@ -10,8 +11,18 @@ def time_splits(df: pd.DataFrame, train_m: int, valid_m: int, test_m: int, step_
         t1 = t0 + pd.DateOffset(months=train_m)
         v1 = t1 + pd.DateOffset(months=valid_m)
         s1 = v1 + pd.DateOffset(months=test_m)
-        tr = (ts>=t0)&(ts<t1)
-        va = (ts>=t1)&(ts<v1)
-        te = (ts>=v1)&(ts<s1)
-        yield (tr.to_numpy().nonzero()[0], va.to_numpy().nonzero()[0], te.to_numpy().nonzero()[0])
+        yield t0, t1, v1, s1
         cur = cur + pd.DateOffset(months=step_m)
+
+def window_indices(ts: pd.Series, bounds):
+    ts = pd.to_datetime(ts, utc=True)
+    t0, t1, v1, s1 = bounds
+    tr = (ts>=t0)&(ts<t1)
+    va = (ts>=t1)&(ts<v1)
+    te = (ts>=v1)&(ts<s1)
+    return (tr.to_numpy().nonzero()[0], va.to_numpy().nonzero()[0], te.to_numpy().nonzero()[0])
+
+def time_splits(df: pd.DataFrame, train_m: int, valid_m: int, test_m: int, step_m: int):
+    ts = pd.to_datetime(df["timestamp"], utc=True)
+    for bounds in window_bounds(ts, train_m, valid_m, test_m, step_m):
+        yield window_indices(ts, bounds)
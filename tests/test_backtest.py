@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.backtest import TIES, grid_backtest, run_backtest
+
+def _bars(n=1500, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(rng.normal(0, 4e-3, n).cumsum())
+    open_ = np.r_[close[0], close[:-1]]
+    # ช่วง high/low กว้างกว่า tp/sl บ่อย ๆ -> มีแท่งที่แตะทั้งสองระดับ (ทดสอบ tie)
+    wick = np.abs(rng.normal(0, 1.2, n))
+    return pd.DataFrame({"timestamp": pd.date_range("2022-01-01", periods=n, freq="5min", tz="UTC"),
+                         "open": open_, "close": close,
+                         "high": np.maximum(open_, close) + wick, "low": np.minimum(open_, close) - wick,
+                         "atr": np.full(n, 0.8)})
+
+def _proba(n, seed=1):
+    return np.random.default_rng(seed).dirichlet([1, 1, 1], n)
+
+def _intrabar_loop(prices, proba, thr, fee_bps, slippage_bps, atr_tp, atr_sl, max_holding, tie):
+    """อ้างอิงทีละแท่ง: แตะเมื่อ high >= ระดับบน / low <= ระดับล่าง, ออกที่ราคา barrier"""
+    o, h, l, c, atr = (prices[k].to_numpy() for k in ("open", "high", "low", "close", "atr"))
+    slp, fee = slippage_bps / 1e4, fee_bps / 1e4
+    N, i, rows = len(c), 0, []
+    while i < N - 1:
+        lp, sp = proba[i, 2], proba[i, 0]
+        s = 1 if (lp >= thr and lp > sp) else -1 if (sp >= thr and sp > lp) else 0
+        if s == 0:
+            i += 1
+            continue
+        px_in = c[i] * (1 + slp if s == 1 else 1 - slp)
+        tp = px_in * (1 + (atr_tp * atr[i] / px_in)) if s == 1 else px_in * (1 - (atr_tp * atr[i] / px_in))
+        sl = px_in * (1 - (atr_sl * atr[i] / px_in)) if s == 1 else px_in * (1 + (atr_sl * atr[i] / px_in))
+        hi_lv, lo_lv = (tp, sl) if s == 1 else (sl, tp)
+        out, px_out, kind = min(i + max_holding, N - 1), None, 0
+        for j in range(i + 1, min(i + 1 + max_holding, N)):
+            up, dn = h[j] >= hi_lv, l[j] <= lo_lv
+            if not (up or dn):
+                continue
+            if up and dn:
+                if tie == "ohlc":
+                    up_first = c[j] < o[j]          # แท่งแดง O-H-L-C แตะบนก่อน
+                else:
+                    up_first = (tie == "tp") == (s == 1)
+            else:
+                up_first = up
+            out = j
+            kind = s if up_first else -s             # แตะบน: long = tp, short = sl
+            px_out = tp if kind == 1 else sl
+            break
+        px = (c[out] if px_out is None else px_out) * (1 - slp if s == 1 else 1 + slp)
+        rows.append((i, out, s, (px / px_in - 1) * s - 2 * fee))
+        i = out + 1
+    return rows
+
+@pytest.mark.parametrize("thr", [0.4, 0.6])
+@pytest.mark.parametrize("max_holding", [1, 12, 48])
+def test_vector_matches_loop(thr, max_holding):
+    prices, proba = _bars(), _proba(1500)
+    kw = dict(thr=thr, fee_bps=5, slippage_bps=2, atr_tp=2.0, atr_sl=1.0, max_holding=max_holding)
+    m_vec, t_vec = run_backtest(prices, proba, engine="vector", **kw)
+    m_loop, t_loop = run_backtest(prices, proba, engine="loop", **kw)
+    assert m_vec == m_loop and m_vec["trades"] > 0
+    pd.testing.assert_frame_equal(t_vec, t_loop)
+
+@pytest.mark.parametrize("tie", TIES)
+@pytest.mark.parametrize("max_holding", [1, 24])
+def test_intrabar_matches_reference_loop(tie, max_holding):
+    prices, proba = _bars(), _proba(1500)
+    kw = dict(thr=0.45, fee_bps=5, slippage_bps=2, atr_tp=1.5, atr_sl=1.0, max_holding=max_holding)
+    m, trades = run_backtest(prices, proba, price_mode="intrabar", tie=tie, **kw)
+    ref = _intrabar_loop(prices, proba, tie=tie, **kw)
+    ts = prices["timestamp"]
+    assert len(trades) == len(ref) == m["trades"] > 0
+    assert (trades["t_in"] == ts.iloc[[r[0] for r in ref]].to_numpy()).all()
+    assert (trades["t_out"] == ts.iloc[[r[1] for r in ref]].to_numpy()).all()
+    np.testing.assert_array_equal(trades["side"], [r[2] for r in ref])
+    np.testing.assert_allclose(trades["ret"], [r[3] for r in ref], rtol=0, atol=1e-15)
+
+def test_intrabar_ties_differ():
+    # ข้อมูลทดสอบต้องมีแท่งที่แตะทั้งสองระดับจริง ไม่งั้นการเทียบ tie ข้างบนไม่ได้ทดสอบอะไร
+    prices, proba = _bars(), _proba(1500)
+    kw = dict(thr=0.45, fee_bps=5, slippage_bps=2, atr_tp=1.5, atr_sl=1.0, max_holding=24, price_mode="intrabar")
+    rets = {t: run_backtest(prices, proba, tie=t, **kw)[1]["ret"].to_numpy() for t in TIES}
+    assert len({r.tobytes() for r in rets.values()}) == len(TIES)
+
+@pytest.mark.parametrize("tie", TIES)
+@pytest.mark.parametrize("price_mode", ["close", "intrabar"])
+def test_grid_matches_run_backtest(tie, price_mode):
+    prices, proba = _bars(600), _proba(600)
+    grid = {"proba_threshold": [0.45, 0.6], "atr_mult_tp": [1.5, 2.0], "atr_mult_sl": [1.0],
+            "max_holding": [6, 24], "fee_bps": [5], "slippage_bps": [0, 2]}
+    res = grid_backtest({0: (prices, proba)}, grid, base={"price_mode": price_mode, "intrabar_tie": tie})
+    assert len(res) == 16
+    for r in res.itertuples(index=False):
+        m, _ = run_backtest(prices, proba, r.proba_threshold, r.fee_bps, r.slippage_bps, r.atr_mult_tp,
+                            r.atr_mult_sl, r.max_holding, price_mode=price_mode, tie=tie)
+        m.pop("intrabar_changed", None)
+        assert {k: getattr(r, k) for k in m} == m
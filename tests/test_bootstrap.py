@@ -0,0 +1,60 @@
+import itertools
+import numpy as np
+import pytest
+
+from src.bootstrap import (METRICS, _block_draws, _shuffle_drawdown, block_stats, bootstrap, resample_index,
+                           resample_metrics)
+from src.backtest import trade_metrics
+
+def _rets(n, seed=0):
+    return np.random.default_rng(seed).normal(2e-4, 4e-3, n)
+
+def _assert_draws(got, ref):
+    for m in METRICS:
+        np.testing.assert_allclose(got[m], ref[m], rtol=1e-10, atol=1e-12, err_msg=m)
+
+@pytest.mark.parametrize("n,b", [(50, 1), (50, 4), (51, 4), (50, 7), (50, 50), (1, 1)])
+def test_block_draws_match_explicit_paths(n, b):
+    ret = _rets(n)
+    starts = np.random.default_rng(1).integers(0, n, size=(300, -(-n // b)))
+    idx = ((starts[:, :, None] + np.arange(b)) % n).reshape(len(starts), -1)[:, :n]
+    _assert_draws(_block_draws(block_stats(ret, b), n, b, starts), resample_metrics(ret[idx]))
+
+def test_block_draws_without_losses():
+    # ไม่มีเทรดขาดทุน -> profit_factor = inf ทั้งสองทาง
+    ret = np.abs(_rets(20)) + 1e-4
+    starts = np.random.default_rng(2).integers(0, 20, size=(50, 5))
+    got = _block_draws(block_stats(ret, 4), 20, 4, starts)
+    assert np.isinf(got["profit_factor"]).all()
+    _assert_draws(got, resample_metrics(ret[resample_index(20, 50, "block", 4, rng=2)]))
+
+@pytest.mark.parametrize("block_len", [0, 1, 5])
+def test_bootstrap_block_matches_resample_index(block_len):
+    # resample เดียวกัน (seed เดียวกัน, chunk เดียว) -> ช่วงความเชื่อมั่นเดียวกับการสุ่มเส้นทางจริง
+    ret, R, ci = _rets(80), 400, 0.9
+    res = bootstrap(ret, n_resamples=R, method="block", block_len=block_len, ci=ci, seed=3).set_index("metric")
+    ref = resample_metrics(ret[resample_index(len(ret), R, "block", block_len, rng=3)])
+    point = trade_metrics(ret)
+    for m in METRICS:
+        lo, hi = np.quantile(ref[m], [(1 - ci) / 2, (1 + ci) / 2], method="inverted_cdf")
+        np.testing.assert_allclose([res.loc[m, "lo"], res.loc[m, "hi"]], [lo, hi], rtol=1e-10, err_msg=m)
+        assert res.loc[m, "point"] == point[m]
+
+def test_shuffle_drawdown_is_a_permutation():
+    # n เล็กพอที่จะไล่ทุกลำดับ: draw ต้องเป็น drawdown ของลำดับจริง ด้วยความถี่ของการสลับแบบสม่ำเสมอ
+    ret = np.array([0.02, -0.03, 0.01, -0.015, 0.005])
+    perms = np.array(list(itertools.permutations(range(len(ret)))))
+    values, counts = np.unique(resample_metrics(ret[perms])["max_drawdown"].round(12), return_counts=True)
+    draws = _shuffle_drawdown(ret, 4000, np.random.default_rng(4))
+    pos = np.searchsorted(values, draws.round(12))
+    np.testing.assert_allclose(values[pos], draws, atol=1e-12)
+    freq = np.bincount(pos, minlength=len(values)) / len(draws)
+    np.testing.assert_allclose(freq, counts / len(perms), atol=0.03)
+
+def test_shuffle_keeps_order_free_metrics():
+    ret = _rets(60)
+    res = bootstrap(ret, n_resamples=200, method="shuffle", seed=5).set_index("metric")
+    point = trade_metrics(ret)
+    for m in ("profit_factor", "total_return_equity", "win_rate"):
+        assert res.loc[m, "lo"] == res.loc[m, "hi"] == point[m]
+    assert res.loc["max_drawdown", "lo"] <= point["max_drawdown"] <= 0
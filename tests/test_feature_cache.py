@@ -0,0 +1,28 @@
+import copy
+import numpy as np
+import pandas as pd
+import yaml
+
+from src.train import prepare_frame
+
+def _bars(n=1500, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(rng.normal(0, 2e-3, n).cumsum())
+    return pd.DataFrame({"timestamp": pd.date_range("2022-01-01", periods=n, freq="5min", tz="UTC"),
+                         "open": close, "high": close * (1 + rng.random(n) * 2e-3),
+                         "low": close * (1 - rng.random(n) * 2e-3), "close": close, "volume": rng.random(n)})
+
+def test_label_cache_keyed_by_feature_dtype(tmp_path):
+    cfg = yaml.safe_load(open("configs/config.yaml", encoding="utf-8"))
+    cfg["label"]["method"] = "first_touch"
+    cfg["feature"].update(cache=True, cache_dir=str(tmp_path))
+    bars = _bars()
+    for dtype in ["float64", "float32"]:
+        c = copy.deepcopy(cfg)
+        c["feature"]["dtype"] = dtype
+        cached = prepare_frame(bars, c)
+        ref = prepare_frame(bars, dict(c, feature=dict(c["feature"], cache=False)))
+        pd.testing.assert_frame_equal(cached, ref)
+    # ป้ายของแต่ละ dtype อยู่คนละไฟล์ (ไม่ใช้ป้ายที่ติดด้วย atr float64 กับเฟรม float32)
+    assert len(list(tmp_path.rglob("target-*.parquet"))) == 2
+    assert not list(tmp_path.rglob("*.json"))
@@ -0,0 +1,54 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.features.indicators import add_features, compute_columns
+from src.features.stream import StreamingFeatures
+
+CFG = {"feature": {"engine": "native", "return_lags": [1, 3, 12], "atr_period": 14, "ema_periods": [12, 48],
+                   "rsi_period": 14}}
+
+def _bars(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(rng.normal(0, 2e-3, n).cumsum())
+    df = pd.DataFrame({"timestamp": pd.date_range("2022-01-01 22:00", periods=n, freq="5min", tz="UTC"),
+                       "open": np.r_[close[0], close[:-1]], "close": close,
+                       "high": close * (1 + rng.random(n) * 1e-3), "low": close * (1 - rng.random(n) * 1e-3),
+                       "volume": rng.random(n)})
+    # แท่งนิ่ง (high == low, ราคาไม่เปลี่ยน): hl_range NaN, body_norm 0, RSI ขาลง 0
+    df.loc[300:320, ["open", "high", "low", "close"]] = df.loc[299, "close"]
+    return df
+
+def _stream(sf, df):
+    return np.array([sf.update(t, o, h, l, c) for t, o, h, l, c in
+                     df[["timestamp", "open", "high", "low", "close"]].itertuples(index=False)])
+
+def _assert_matches(got, ref):
+    np.testing.assert_array_equal(np.isnan(got), np.isnan(ref))
+    scale = np.nanmax(np.abs(ref), axis=0)
+    np.testing.assert_array_less(np.nanmax(np.abs(got - ref), axis=0), 1e-12 * scale + 1e-15)
+
+def test_stream_matches_compute_columns():
+    df = _bars()
+    sf = StreamingFeatures(CFG)
+    ref = compute_columns(df, CFG)
+    assert sf.columns == list(ref.columns)
+    _assert_matches(_stream(sf, df), ref.to_numpy())
+
+def test_stream_rows_match_add_features():
+    df = _bars()
+    got = _stream(StreamingFeatures(CFG), df)
+    feat = add_features(df, CFG)
+    keep = ~np.isnan(got).any(axis=1)
+    np.testing.assert_array_equal(np.flatnonzero(keep), feat.index.to_numpy())
+    _assert_matches(got[keep], feat[StreamingFeatures(CFG).columns].to_numpy())
+
+@pytest.mark.parametrize("split", [5, 13, 200])
+def test_from_frame_then_update(split):
+    df = _bars()
+    ref = compute_columns(df, CFG).to_numpy()
+    sf = StreamingFeatures.from_frame(df.iloc[:split], CFG)
+    # snapshot ผ่าน JSON แล้ว restore ต้องเดินต่อได้เหมือนเดิม
+    sf = StreamingFeatures(CFG).restore(json.loads(json.dumps(sf.snapshot())))
+    _assert_matches(_stream(sf, df.iloc[split:]), ref[split:])
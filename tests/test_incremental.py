@@ -0,0 +1,117 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.incremental import incremental_update
+from src.data.load import load_all, load_files
+from src.data.store import write_partitioned, read_range
+from src.data.schema import to_prepared, from_prepared
+
+START = pd.Timestamp("2022-01-31 12:00")    # ข้ามขอบเดือน (UTC) ระหว่างไฟล์
+
+def _write(path, start, n, seed, close=None):
+    rng = np.random.default_rng(seed)
+    px = 100 + rng.normal(0, 1, n).cumsum() if close is None else np.full(n, close)
+    pd.DataFrame({"timestamp": pd.date_range(start, periods=n, freq="5min").strftime("%Y-%m-%d %H:%M:%S"),
+                  "open": px, "high": px + 1, "low": px - 1, "close": px,
+                  "volume": rng.random(n)}).to_csv(path, index=False)
+    # mtime ใหม่เสมอ (เขียนซ้ำเร็วจน mtime_ns อาจเท่าเดิม)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9 * (seed + 1)))
+
+def _cfg(raw, fill_seams, compact=False):
+    return {"raw_glob": str(raw / "*.csv"), "tz_source": "Asia/Bangkok", "tz_target": "UTC",
+            "ensure_regular_5m": True, "fill_seams": fill_seams, "compact": compact,
+            "price_dtype": "int64", "price_scale": 100}
+
+def _full(tmp_path, cfg, engine):
+    out, man = str(tmp_path / "full.parquet"), str(tmp_path / "full.json")
+    for p in (out, man):
+        if os.path.exists(p):
+            os.remove(p)
+    df, info = incremental_update(cfg, out, man, engine=engine)
+    assert info["mode"] == "full"
+    return pd.read_parquet(out)
+
+def _incremental(tmp_path, cfg, engine, mode="incremental"):
+    out = str(tmp_path / "store.parquet")
+    df, info = incremental_update(cfg, out, str(tmp_path / "manifest.json"), engine=engine)
+    assert info["mode"] == mode
+    return pd.read_parquet(out), df, info
+
+@pytest.mark.parametrize("engine", ["join", "epoch"])
+@pytest.mark.parametrize("fill_seams", [False, True])
+def test_new_file_after_gap(tmp_path, engine, fill_seams):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    cfg = _cfg(raw, fill_seams)
+    _write(raw / "a.csv", START, 300, 0)
+    _incremental(tmp_path, cfg, engine, mode="full")
+    # ไฟล์ใหม่เริ่มหลังแท่งสุดท้ายของไฟล์เดิม 200 นาที (ช่องว่าง 39 แท่ง)
+    _write(raw / "b.csv", START + pd.Timedelta(minutes=5 * 299 + 200), 300, 1)
+    inc, tail, info = _incremental(tmp_path, cfg, engine)
+    full = _full(tmp_path, cfg, engine)
+    assert len(full) == 600 + 39 * fill_seams
+    pd.testing.assert_frame_equal(inc, full)
+    # สร้างใหม่เฉพาะส่วนท้าย (ตั้งแต่ต้นเดือนของแท่งก่อนไฟล์ใหม่) ไม่ใช่ทั้ง store
+    assert len(tail) < len(full) and info["rows"] == len(full)
+
+@pytest.mark.parametrize("engine", ["join", "epoch"])
+@pytest.mark.parametrize("compact", [False, True])
+def test_changed_file_next_to_gap(tmp_path, engine, compact):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    cfg = _cfg(raw, True, compact)
+    _write(raw / "a.csv", START, 300, 0, close=1.0)
+    _write(raw / "b.csv", START + pd.Timedelta(minutes=5 * 299 + 25), 300, 1)
+    prev, _, _ = _incremental(tmp_path, cfg, engine, mode="full")
+    write_partitioned(prev, str(tmp_path / "parts"))
+    _write(raw / "a.csv", START, 300, 2, close=5.0)
+    inc, tail, info = _incremental(tmp_path, cfg, engine)
+    full = _full(tmp_path, cfg, engine)
+    pd.testing.assert_frame_equal(inc, full)
+    bars = from_prepared(inc, cfg)
+    seam = bars[bars["timestamp"] > START.tz_localize("Asia/Bangkok") + pd.Timedelta(minutes=5 * 299)].head(4)
+    assert len(seam) == 4 and (seam["close"] == 5.0).all()
+    # partitioned store: เขียนเฉพาะเดือนที่ส่วนท้ายครอบ แล้วต้องเท่ากับ full
+    write_partitioned(to_prepared(tail, cfg), str(tmp_path / "parts"), touched=info["touched"])
+    parts = read_range(str(tmp_path / "parts"), "2022-01-01 00:00+00:00", "2022-03-01 00:00+00:00")
+    pd.testing.assert_frame_equal(parts, full.sort_values("timestamp", ignore_index=True), check_dtype=False)
+
+@pytest.mark.parametrize("fill_seams", [False, True])
+def test_file_inserted_into_gap(tmp_path, fill_seams):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    cfg = _cfg(raw, fill_seams)
+    _write(raw / "a.csv", START, 100, 0)
+    _write(raw / "c.csv", START + pd.Timedelta(hours=24), 100, 2)
+    _incremental(tmp_path, cfg, "epoch", mode="full")
+    _write(raw / "b.csv", START + pd.Timedelta(hours=12), 50, 1)
+    inc, _, _ = _incremental(tmp_path, cfg, "epoch")
+    pd.testing.assert_frame_equal(inc, _full(tmp_path, cfg, "epoch"))
+
+def test_overlapping_change_falls_back_to_full(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    cfg = _cfg(raw, False)
+    _write(raw / "a.csv", START, 100, 0)
+    _incremental(tmp_path, cfg, "epoch", mode="full")
+    _write(raw / "b.csv", START + pd.Timedelta(minutes=250), 100, 1)   # ทับช่วงท้ายของ a
+    inc, _, _ = _incremental(tmp_path, cfg, "epoch", mode="full")
+    pd.testing.assert_frame_equal(inc, _full(tmp_path, cfg, "epoch"))
+
+@pytest.mark.parametrize("ensure_regular", [False, True])
+def test_load_all_default_matches_baseline(tmp_path, ensure_regular):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    _write(raw / "a.csv", START, 15, 0)
+    _write(raw / "b.csv", START + pd.Timedelta(minutes=5 * 10), 10, 1)    # ทับ a 5 แท่ง
+    _write(raw / "c.csv", START + pd.Timedelta(hours=3), 10, 2)           # หลังช่องว่าง
+    glob_ = str(raw / "*.csv")
+    dfs = load_files(sorted(map(str, raw.glob("*.csv"))), "Asia/Bangkok", "UTC", ensure_regular)
+    base = pd.concat(dfs, ignore_index=True).sort_values("timestamp")
+    pd.testing.assert_frame_equal(load_all(glob_, "Asia/Bangkok", "UTC", ensure_regular), base)
+    seams = load_all(glob_, "Asia/Bangkok", "UTC", ensure_regular, fill_seams=True)
+    assert seams["timestamp"].is_unique
+    assert len(seams) == (46 if ensure_regular else 30)
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.features import native
+from src.features.indicators import _ta_atr, _ta_ema, _ta_rsi, compute_columns
+
+def _bars(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(rng.normal(0, 2e-3, n).cumsum())
+    return pd.DataFrame({"timestamp": pd.date_range("2022-01-01", periods=n, freq="5min", tz="UTC"),
+                         "open": np.r_[close[0], close[:-1]], "close": close,
+                         "high": close * (1 + rng.random(n) * 1e-3), "low": close * (1 - rng.random(n) * 1e-3),
+                         "volume": rng.random(n)})
+
+def _close(a, b, rtol=1e-13):
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    np.testing.assert_array_equal(np.isnan(a), np.isnan(b))
+    scale = np.nanmax(np.abs(b))
+    np.testing.assert_allclose(a, b, rtol=0, atol=rtol * scale, equal_nan=True)
+
+@pytest.mark.parametrize("period", [1, 2, 14, 50, 200])
+def test_ema_matches_ta(period):
+    df = _bars()
+    _close(native.ema(df["close"].to_numpy(), period), _ta_ema(df["close"], period))
+
+@pytest.mark.parametrize("period", [1, 14, 100])
+def test_atr_matches_ta(period):
+    df = _bars()
+    got = native.atr(df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy(), period)
+    _close(got, _ta_atr(df["close"], df["high"], df["low"], period))
+
+@pytest.mark.parametrize("period", [2, 14, 30])
+def test_rsi_matches_ta(period):
+    df = _bars()
+    # ช่วงราคาคงที่: ขาลง = 0 -> RSI 100 เหมือน ta
+    df.loc[500:520, "close"] = df.loc[499, "close"]
+    _close(native.rsi(df["close"].to_numpy(), period), _ta_rsi(df["close"], period))
+
+def test_short_series_warmup():
+    df = _bars(n=10)
+    got = native.atr(df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy(), 14)
+    np.testing.assert_array_equal(got, np.zeros(10))
+    assert np.isnan(native.ema(df["close"].to_numpy(), 14)).all()
+
+def test_compute_columns_native_matches_ta():
+    df = _bars()
+    cfg = {"feature": {"return_lags": [1, 3, 12], "atr_period": 14, "ema_periods": [12, 48], "rsi_period": 14}}
+    ta = compute_columns(df, {"feature": {**cfg["feature"], "engine": "ta"}})
+    nat = compute_columns(df, {"feature": {**cfg["feature"], "engine": "native"}})
+    assert list(nat.columns) == list(ta.columns)
+    for c in ta.columns:
+        # ema_*_gap = ผลต่างของค่าใกล้กัน จึงเผื่อกว่าตัว EMA
+        _close(nat[c], ta[c], rtol=1e-12)
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.load import _join_regular_5m, regularize_5m_epoch
+
+def _frame(minutes, rng):
+    n = len(minutes)
+    px = rng.normal(100, 1, n)
+    px[rng.random(n) < 0.15] = np.nan
+    return pd.DataFrame({"timestamp": pd.Timestamp("2022-01-01") + pd.to_timedelta(minutes, unit="min"),
+                         "open": px, "high": px + 1, "low": px - 1, "close": px, "volume": rng.random(n)})
+
+def _check(df):
+    ref = _join_regular_5m(df, "UTC", "Asia/Bangkok")
+    out, filled = regularize_5m_epoch(df, "UTC", "Asia/Bangkok")
+    pd.testing.assert_frame_equal(out, ref)
+    ts = pd.to_datetime(df["timestamp"]).dt.tz_localize("UTC").dt.tz_convert("Asia/Bangkok")
+    assert filled == int((~ref["timestamp"].isin(ts)).sum())
+
+def test_offgrid_tail_extends_grid():
+    df = _frame(np.array([0, 12]), np.random.default_rng(0))
+    df[["open", "high", "low", "close"]] = 1.0
+    out, filled = regularize_5m_epoch(df, "UTC", "UTC")
+    assert len(out) == 3 and filled == 2
+    _check(df)
+
+@pytest.mark.parametrize("seed", range(400))
+def test_epoch_matches_join(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 40))
+    minutes = np.sort(rng.choice(np.arange(0, 400, 5), size=n))
+    off = rng.random(n) < 0.3                      # off-grid (รวมแถวแรก/แถวสุดท้าย)
+    minutes[off] += rng.integers(1, 5, off.sum())
+    if n > 2 and rng.random() < 0.3:               # timestamp ซ้ำ
+        minutes[1] = minutes[0]
+    df = _frame(minutes, rng).sample(frac=1, random_state=seed)
+    _check(df)
+
+def test_nat_timestamp_matches_join():
+    df = _frame(np.array([0, 5, 10]), np.random.default_rng(1))
+    df.loc[2, "timestamp"] = pd.NaT
+    with pytest.raises(ValueError):
+        _join_regular_5m(df, "UTC", "UTC")
+    with pytest.raises(ValueError):
+        regularize_5m_epoch(df, "UTC", "UTC")
@@ -0,0 +1,15 @@
+import numpy as np
+import pandas as pd
+
+from src.data.schema import from_prepared, to_prepared
+
+def test_int64_prices_round_trip_exactly():
+    cfg = {"compact": True, "price_dtype": "int64", "price_scale": 100}
+    px = np.array([168000.01, 262144.37, 300000.01, 1234567.89])
+    df = pd.DataFrame({"timestamp": pd.date_range("2022-01-01", periods=len(px), freq="5min", tz="UTC"),
+                       "open": px, "high": px, "low": px, "close": px, "volume": np.ones(len(px))})
+    stored = to_prepared(df, cfg)
+    again = to_prepared(from_prepared(stored, cfg), cfg)   # incremental merge: อ่าน store แล้วเขียนกลับ
+    for c in ["open", "high", "low", "close"]:
+        np.testing.assert_array_equal(again[c].to_numpy(), stored[c].to_numpy())
+    assert from_prepared(stored, cfg)["close"].dtype == np.float64
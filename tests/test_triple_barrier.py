@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+
+from src.labeling.triple_barrier import first_touch_labels, label_grid
+
+def _bars(n=50, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + rng.normal(0, 1, n).cumsum()
+    return pd.DataFrame({"timestamp": pd.date_range("2022-01-01", periods=n, freq="5min", tz="UTC"),
+                         "close": close, "high": close + rng.random(n), "low": close - rng.random(n),
+                         "atr": np.full(n, 0.5)})
+
+def test_first_touch_zero_holding():
+    out = first_touch_labels(_bars(), 2.0, 1.0, max_holding=0, min_move_bps=3)
+    assert (out["target"] == 0).all()
+    np.testing.assert_array_equal(out["touch_idx"].to_numpy(), np.arange(len(out)))
+
+def test_label_grid_zero_holding():
+    df = _bars()
+    labels, stats = label_grid(df, {"atr_mult_tp": [2.0], "atr_mult_sl": [1.0], "max_holding": [0], "min_move_bps": [0]})
+    assert labels.shape == (len(df), 1) and (labels == 0).all()
+    ref = first_touch_labels(df, 2.0, 1.0, 4)["target"].to_numpy()
+    labels, _ = label_grid(df, {"atr_mult_tp": [2.0], "atr_mult_sl": [1.0], "max_holding": [0, 4], "min_move_bps": [0]})
+    np.testing.assert_array_equal(labels[:, 1], ref)